@@ -0,0 +1,93 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, List, Optional, Set, Tuple, TypeVar
+from app.core.metrics import metrics
+
+T = TypeVar("T")
+
+write_batch_size = metrics.histogram(
+    "write_batch_size", "Items written per coalesced batch", ("batcher",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+write_batch_duration = metrics.histogram(
+    "write_batch_duration_seconds", "Time to write a coalesced batch", ("batcher",)
+)
+
+
+class WriteBatcher(Generic[T]):
+    """
+    Coalesces concurrent single-item writes into batches.
+
+    Items submitted while a batch is open are written together by one call of
+    write(items), which returns None or an exception per item, in order. A batch
+    is written max_delay_seconds after its first item arrived or as soon as it
+    holds max_size items, whichever comes first, so batching adds at most
+    max_delay_seconds to a write. Each submit() returns or raises for its own
+    item only.
+    """
+    def __init__(
+        self,
+        write: Callable[[List[T]], Awaitable[List[Optional[Exception]]]],
+        max_size: int,
+        max_delay_seconds: float,
+        name: str
+    ):
+        self.write = write
+        self.max_size = max_size
+        self.max_delay_seconds = max_delay_seconds
+        self.name = name
+        self._pending: List[Tuple[T, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Batches being written, referenced so they are not garbage collected
+        self._writing: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item: T):
+        """Write item in the next batch; raises the item's own write error."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay_seconds, self._flush)
+        # Shielded: a cancelled caller's item is still written with its batch
+        await asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._write_batch(batch))
+            self._writing.add(task)
+            task.add_done_callback(self._writing.discard)
+
+    async def _write_batch(self, batch: List[Tuple[T, asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            errors = await self.write([item for item, _ in batch])
+        except Exception as e:
+            errors = [e] * len(batch)
+        finally:
+            write_batch_size.observe(len(batch), (self.name,))
+            write_batch_duration.observe(loop.time() - started, (self.name,))
+        for (_, future), error in zip(batch, errors):
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+                # Marks the exception as retrieved, in case its caller was cancelled
+                future.exception()
+
+    async def flush(self):
+        """Write the open batch now and wait for all batches being written, e.g. on shutdown."""
+        self._flush()
+        if self._writing:
+            await asyncio.gather(*self._writing, return_exceptions=True)
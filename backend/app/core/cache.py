@@ -0,0 +1,80 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Generic, Hashable, Optional, TypeVar
+from app.core.metrics import metrics
+
+V = TypeVar("V")
+
+
+# Named caches, exported on /metrics
+_named_caches: Dict[str, "TTLCache"] = {}
+metrics.callback(
+    "cache_entries", "Entries in an in-process cache",
+    lambda: {(name,): len(cache._entries) for name, cache in _named_caches.items()}, ("cache",)
+)
+metrics.callback(
+    "cache_hits_total", "Cache lookups that found a value",
+    lambda: {(name,): cache.hits for name, cache in _named_caches.items()}, ("cache",), "counter"
+)
+metrics.callback(
+    "cache_misses_total", "Cache lookups that found nothing",
+    lambda: {(name,): cache.misses for name, cache in _named_caches.items()}, ("cache",), "counter"
+)
+
+
+class TTLCache(Generic[V]):
+    """
+    Bounded in-process LRU cache whose entries expire after ttl_seconds.
+
+    When full, the least recently used entry is evicted. Not shared between
+    processes or instances: invalidate() only affects this process, so ttl_seconds
+    bounds how long other instances may serve a stale entry.
+    """
+    def __init__(self, max_size: int, ttl_seconds: float, name: Optional[str] = None):
+        if name is not None:
+            _named_caches[name] = self
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """The cached value, or None (counted as a miss) if absent or expired."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def set(self, key: Hashable, value: V, ttl_seconds: Optional[float] = None):
+        """Cache a value for ttl_seconds (default: the cache's TTL)."""
+        if self.max_size <= 0:
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Size and hit/miss counters since startup."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None,
+        }
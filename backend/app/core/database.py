@@ -1,35 +1,111 @@
+import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 from typing import Optional
 from fastapi import FastAPI
 import os
 from dotenv import load_dotenv
 import certifi
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+from app.core.metrics import mongodb_event_listeners, mongodb_pool_stats
 
 load_dotenv()
 
+DATABASE_NAME = "personal_finance"
+# Connections per MongoDB server at most; size it to the requests a worker serves at once
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+# Connections kept open per server even when idle
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+# Milliseconds a connection may sit idle in the pool before it is closed (unset keeps it open)
+MONGODB_MAX_IDLE_TIME_MS = os.getenv("MONGODB_MAX_IDLE_TIME_MS")
+# Milliseconds an operation waits for a connection when the pool is exhausted (unset waits for the server selection timeout)
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS")
+# Wire compression in order of preference, e.g. "zstd,snappy,zlib" (empty disables it);
+# zstd needs the zstandard package and snappy python-snappy, unavailable ones are skipped
+MONGODB_COMPRESSORS = os.getenv("MONGODB_COMPRESSORS", "")
+# Read preference of the app's reads ("primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"; any case)
+MONGODB_READ_PREFERENCE = os.getenv("MONGODB_READ_PREFERENCE", "primary")
+# Read preference of analytics and export reads, which tolerate slightly stale data
+MONGODB_ANALYTICS_READ_PREFERENCE = os.getenv("MONGODB_ANALYTICS_READ_PREFERENCE", "secondaryPreferred")
+# How far behind the primary a secondary may be to serve reads, in seconds (at least 90; -1 for no limit)
+MONGODB_MAX_STALENESS_SECONDS = int(os.getenv("MONGODB_MAX_STALENESS_SECONDS", "-1"))
+
+
+# Read preference names as pymongo spells them, by their lowercase form
+READ_PREFERENCE_NAMES = {
+    name.lower(): name for name in ("primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest")
+}
+
+
+def read_preference(name: str):
+    """
+    The pymongo read preference called name (in any case), limited to MONGODB_MAX_STALENESS_SECONDS of lag.
+
+    Raises ValueError for an unknown name.
+    """
+    canonical = READ_PREFERENCE_NAMES.get(name.strip().lower())
+    if canonical is None:
+        raise ValueError(f"Unknown read preference {name!r}, expected one of: {', '.join(READ_PREFERENCE_NAMES.values())}")
+    mode = read_pref_mode_from_name(canonical)
+    # The primary is never stale, and pymongo rejects a staleness limit for it
+    return make_read_preference(mode, None, -1 if canonical == "primary" else MONGODB_MAX_STALENESS_SECONDS)
+
+
+def client_options() -> dict:
+    """Pool, compression and read preference options of the MongoDB client."""
+    options = {
+        "maxPoolSize": MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": MONGODB_MIN_POOL_SIZE,
+        "read_preference": read_preference(MONGODB_READ_PREFERENCE),
+    }
+    if MONGODB_MAX_IDLE_TIME_MS:
+        options["maxIdleTimeMS"] = int(MONGODB_MAX_IDLE_TIME_MS)
+    if MONGODB_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = int(MONGODB_WAIT_QUEUE_TIMEOUT_MS)
+    if MONGODB_COMPRESSORS:
+        options["compressors"] = MONGODB_COMPRESSORS
+    return options
+
+
 class Database:
     client: Optional[AsyncIOMotorClient] = None
     db = None
-    
+    # The same database for analytics and export reads, routed by MONGODB_ANALYTICS_READ_PREFERENCE
+    analytics_db = None
+
     async def connect_to_database(self, app: FastAPI):
         try:
             MONGODB_URL = os.getenv("MONGODB_URL", "your_mongodb_connection_string_here")
             self.client = AsyncIOMotorClient(
                 MONGODB_URL,
-                tlsCAFile=certifi.where()
+                tlsCAFile=certifi.where(),
+                # Command latency, document counts and pool checkout waits for /metrics
+                event_listeners=mongodb_event_listeners(),
+                **client_options()
             )
-            
+
             # Use the personal_finance database
-            self.db = self.client.personal_finance
-            
+            self.db = self.client[DATABASE_NAME]
+            self.analytics_db = self.client.get_database(
+                DATABASE_NAME, read_preference=read_preference(MONGODB_ANALYTICS_READ_PREFERENCE)
+            )
+
             # Verify connection
             await self.client.admin.command('ping')
             print("Successfully connected to MongoDB!")
-            
+
         except Exception as e:
             print(f"Error connecting to MongoDB: {e}")
             raise e
 
+    async def open_connections(self, count: int):
+        """Open up to count pooled connections now, by running that many pings at once."""
+        count = min(count, MONGODB_MAX_POOL_SIZE)
+        await asyncio.gather(*[self.client.admin.command('ping') for _ in range(count)])
+
+    def pool_stats(self) -> dict:
+        """Connection pool statistics per server address (see mongodb_pool_stats)."""
+        return mongodb_pool_stats()
+
     async def close_database_connection(self):
         if self.client:
             self.client.close()
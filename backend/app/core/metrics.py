@@ -0,0 +1,318 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+from pymongo import common, monitoring
+
+# Latency buckets in seconds, from 1 ms to 10 s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Commands whose first argument is a collection name
+COLLECTION_COMMANDS = {
+    "find", "getMore", "insert", "update", "delete", "aggregate", "count", "distinct",
+    "findAndModify", "createIndexes", "listIndexes", "dropIndexes"
+}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {value}" for labels, value in list(self._values.items())]
+
+
+class Histogram:
+    """
+    Observations counted in fixed buckets per label set.
+
+    An observation costs one bisect and three increments; buckets are only made
+    cumulative when rendered.
+    """
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (last one is +Inf), sum]
+        self._values: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: tuple = ()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """A gauge or counter read from its owner when rendered: func returns {label values: value}."""
+    def __init__(self, name: str, help: str, func: Callable[[], Dict[tuple, float]], labelnames: Sequence[str] = (), type: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.func = func
+        self.labelnames = tuple(labelnames)
+        self.type = type
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, labels)} {value}"
+            for labels, value in self.func().items()
+            if value is not None
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name: str, help: str, func: Callable[[], Dict[tuple, float]], labelnames: Sequence[str] = (), type: str = "gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, func, labelnames, type))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# Create a global instance
+metrics = MetricsRegistry()
+
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "Time to send the full response, per route template",
+    ("method", "route", "status")
+)
+mongodb_command_duration = metrics.histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency", ("collection", "command", "status")
+)
+mongodb_command_documents = metrics.counter(
+    "mongodb_command_documents_total", "Documents returned or written by MongoDB commands", ("collection", "command")
+)
+mongodb_pool_checkout_duration = metrics.histogram(
+    "mongodb_pool_checkout_duration_seconds", "Time waiting to check a connection out of the pool", ("address",)
+)
+mongodb_pool_checkout_failures = metrics.counter(
+    "mongodb_pool_checkout_failures_total", "Connection checkouts that failed, e.g. on the wait queue timeout",
+    ("address", "reason")
+)
+# address -> pool statistics, maintained by PoolMetricsListener
+_pools: Dict[str, dict] = {}
+_pools_lock = threading.Lock()
+
+
+def mongodb_pool_stats() -> Dict[str, dict]:
+    """
+    Connection pool statistics per MongoDB server address.
+
+    Each entry holds max_size and min_size (as configured), connections (open),
+    checked_out (in use), waiting (operations waiting for a connection),
+    checkouts and checkout_failures (since startup) and cleared (times the pool
+    was reset after a network error).
+    """
+    with _pools_lock:
+        return {address: dict(stats) for address, stats in _pools.items()}
+
+
+def _pool_gauge(key: str):
+    return lambda: {(address,): stats[key] for address, stats in mongodb_pool_stats().items()}
+
+
+for _name, _key, _help in (
+    ("mongodb_pool_max_size", "max_size", "Connections the pool may open at most"),
+    ("mongodb_pool_connections", "connections", "Connections currently open"),
+    ("mongodb_pool_connections_checked_out", "checked_out", "Connections currently checked out of the pool"),
+    ("mongodb_pool_wait_queue", "waiting", "Operations currently waiting for a connection"),
+):
+    metrics.callback(_name, _help, _pool_gauge(_key), ("address",))
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request per method, route template and status."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope; label by its template to bound cardinality
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                (scope["method"], route.path if route is not None else "unmatched", status)
+            )
+
+
+def _document_count(command_name: str, reply: dict) -> int:
+    if command_name in ("find", "aggregate", "getMore"):
+        cursor = reply.get("cursor", {})
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if command_name in ("insert", "update", "delete"):
+        return reply.get("n", 0)
+    return 0
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Records the latency and document count of every MongoDB command per collection."""
+    def __init__(self):
+        self._collections: Dict[Tuple[object, int], str] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name) if event.command_name in COLLECTION_COMMANDS else None
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        self._collections[(event.connection_id, event.request_id)] = collection if isinstance(collection, str) else ""
+
+    def _finish(self, event, status: str):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        mongodb_command_duration.observe(event.duration_micros / 1e6, (collection, event.command_name, status))
+        return collection
+
+    def succeeded(self, event):
+        collection = self._finish(event, "ok")
+        documents = _document_count(event.command_name, event.reply)
+        if documents:
+            mongodb_command_documents.inc((collection, event.command_name), documents)
+
+    def failed(self, event):
+        self._finish(event, "failed")
+
+
+def _address(event) -> str:
+    return f"{event.address[0]}:{event.address[1]}"
+
+
+def _add_to_pool(address: str, **amounts):
+    with _pools_lock:
+        stats = _pools.get(address)
+        # Events of a pool that was already closed are ignored
+        if stats is not None:
+            for key, amount in amounts.items():
+                stats[key] += amount
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Records connection checkout wait times and keeps the statistics of mongodb_pool_stats."""
+    def __init__(self):
+        # Checkouts run synchronously on the thread that requested them
+        self._checkout_started = threading.local()
+
+    def pool_created(self, event):
+        with _pools_lock:
+            _pools[_address(event)] = {
+                "max_size": event.options.get("maxPoolSize", common.MAX_POOL_SIZE),
+                "min_size": event.options.get("minPoolSize", common.MIN_POOL_SIZE),
+                "connections": 0,
+                "checked_out": 0,
+                "waiting": 0,
+                "checkouts": 0,
+                "checkout_failures": 0,
+                "cleared": 0,
+            }
+
+    def pool_closed(self, event):
+        with _pools_lock:
+            _pools.pop(_address(event), None)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        _add_to_pool(_address(event), cleared=1)
+
+    def connection_created(self, event):
+        _add_to_pool(_address(event), connections=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        _add_to_pool(_address(event), connections=-1)
+
+    def connection_check_out_started(self, event):
+        self._checkout_started.at = time.perf_counter()
+        _add_to_pool(_address(event), waiting=1)
+
+    def connection_checked_out(self, event):
+        address = _address(event)
+        started = getattr(self._checkout_started, "at", None)
+        if started is not None:
+            mongodb_pool_checkout_duration.observe(time.perf_counter() - started, (address,))
+            self._checkout_started.at = None
+        _add_to_pool(address, waiting=-1, checked_out=1, checkouts=1)
+
+    def connection_check_out_failed(self, event):
+        address = _address(event)
+        self._checkout_started.at = None
+        mongodb_pool_checkout_failures.inc((address, event.reason))
+        _add_to_pool(address, waiting=-1, checkout_failures=1)
+
+    def connection_checked_in(self, event):
+        _add_to_pool(_address(event), checked_out=-1)
+
+
+def mongodb_event_listeners() -> list:
+    """Listeners to pass to the MongoDB client so its commands and pool are measured."""
+    return [CommandMetricsListener(), PoolMetricsListener()]
@@ -0,0 +1,40 @@
+from decimal import Decimal
+from typing import Optional
+import os
+
+# Currency of amounts that do not name one (including transactions stored before currencies existed)
+DEFAULT_CURRENCY = os.getenv("DEFAULT_CURRENCY", "USD")
+
+# ISO 4217 currencies whose minor unit is not 1/100
+MINOR_UNIT_EXPONENTS = {
+    "BIF": 0, "CLP": 0, "DJF": 0, "GNF": 0, "ISK": 0, "JPY": 0, "KMF": 0, "KRW": 0,
+    "PYG": 0, "RWF": 0, "UGX": 0, "UYI": 0, "VND": 0, "VUV": 0, "XAF": 0, "XOF": 0, "XPF": 0,
+    "BHD": 3, "IQD": 3, "JOD": 3, "KWD": 3, "LYD": 3, "OMR": 3, "TND": 3,
+}
+
+
+def minor_unit_exponent(currency: str) -> int:
+    """Number of decimal places of a currency's minor unit (2 for USD cents)."""
+    return MINOR_UNIT_EXPONENTS.get(currency, 2)
+
+
+def to_minor_units(amount: Decimal, currency: str, rounding: Optional[str] = None) -> int:
+    """
+    Convert an amount to an integer number of minor units (e.g. 12.34 USD -> 1234).
+
+    Raises ValueError if the amount has more decimal places than the currency allows,
+    unless a decimal rounding mode (e.g. decimal.ROUND_CEILING) is given to round it with.
+    """
+    minor = Decimal(amount).scaleb(minor_unit_exponent(currency))
+    if not minor.is_finite():
+        raise ValueError(f"Invalid amount: {amount}")
+    if rounding is not None:
+        return int(minor.to_integral_value(rounding=rounding))
+    if minor != minor.to_integral_value():
+        raise ValueError(f"{currency} amounts cannot have more than {minor_unit_exponent(currency)} decimal places")
+    return int(minor)
+
+
+def from_minor_units(minor: int, currency: str) -> Decimal:
+    """Convert an integer number of minor units back to an amount (e.g. 1234 USD -> 12.34)."""
+    return Decimal(minor).scaleb(-minor_unit_exponent(currency))
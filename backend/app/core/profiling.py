@@ -0,0 +1,89 @@
+import asyncio
+import hmac
+import logging
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Fraction of requests to profile (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Secret that profiles a request when sent in the X-Profile header (unset disables the header)
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+# Seconds between stack samples
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+# Requests profiled at once at most; others run unprofiled
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "2"))
+# Profiles kept in PROFILE_DIR; the oldest are deleted beyond that
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+
+
+def profiling_enabled() -> bool:
+    """Whether any request can be profiled; when not, ProfilingMiddleware should not be installed at all."""
+    return PROFILE_SAMPLE_RATE > 0 or bool(PROFILE_TOKEN)
+
+
+def _write_profile(path: Path, content: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+    profiles = sorted(path.parent.glob("*.speedscope.json"))
+    for old in profiles[:max(0, len(profiles) - PROFILE_MAX_FILES)]:
+        old.unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling sampled requests, or requests sending
+    "X-Profile: <PROFILE_TOKEN>", with pyinstrument.
+
+    Each profile is written to PROFILE_DIR in the speedscope format (open it on
+    speedscope.app for a flamegraph), named after the time, route template and
+    duration. Install it only when profiling_enabled(), so that it costs nothing
+    otherwise.
+    """
+    def __init__(self, app):
+        self.app = app
+        self._active = 0
+
+    def _should_profile(self, scope) -> bool:
+        if self._active >= PROFILE_MAX_CONCURRENT:
+            return False
+        if PROFILE_TOKEN:
+            for name, value in scope.get("headers", []):
+                if name == b"x-profile":
+                    return hmac.compare_digest(value, PROFILE_TOKEN.encode())
+        return random.random() < PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            return await self.app(scope, receive, send)
+
+        # Only profiling needs pyinstrument, so it is loaded on the first profiled request
+        from pyinstrument import Profiler
+        from pyinstrument.renderers import SpeedscopeRenderer
+
+        self._active += 1
+        profiler = Profiler(interval=PROFILE_INTERVAL, async_mode="enabled")
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.stop()
+            self._active -= 1
+            duration_ms = (time.perf_counter() - started) * 1000
+            route = scope.get("route")
+            route_name = re.sub(r"[^A-Za-z0-9]+", "_", route.path if route is not None else "unmatched").strip("_")
+            timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+            path = PROFILE_DIR / f"{timestamp}_{scope['method']}_{route_name or 'root'}_{duration_ms:.0f}ms.speedscope.json"
+            try:
+                content = profiler.output(SpeedscopeRenderer())
+                await asyncio.get_running_loop().run_in_executor(None, _write_profile, path, content)
+                logger.info(f"Profiled {scope['method']} {scope['path']} ({duration_ms:.0f} ms): {path}")
+            except Exception as e:
+                logger.error(f"Error writing profile {path}: {e}")
@@ -1,105 +1,411 @@
-from fastapi import HTTPException, Request, status
-from fastapi.responses import JSONResponse
-from typing import Callable, Dict, Optional
-import time
-from datetime import datetime
 import asyncio
-from functools import wraps
+import json
+import logging
+import math
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from starlette.routing import Match
+from app.core.security import verify_token
+from app.core.metrics import metrics
 
-# In-memory store for rate limiting
-# In production, use Redis or similar distributed cache
-rate_limit_store: Dict[str, Dict[str, int]] = {}
+logger = logging.getLogger(__name__)
 
-class RateLimiter:
+TOKEN_BUCKET = "token_bucket"
+SLIDING_WINDOW = "sliding_window"
+
+# Where limiter state is kept: "memory" (per process, default) or "redis" (shared by all workers)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Clients tracked in memory at most; the least recently seen are dropped beyond that
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# How often idle clients are swept from memory
+RATE_LIMIT_SWEEP_SECONDS = float(os.getenv("RATE_LIMIT_SWEEP_SECONDS", "30"))
+# Cost units each user may spend per USER_QUOTA_SECONDS on endpoints that declare a QuotaCost
+USER_QUOTA_UNITS = int(os.getenv("USER_QUOTA_UNITS", "1000"))
+USER_QUOTA_SECONDS = int(os.getenv("USER_QUOTA_SECONDS", "60"))
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    remaining: int
+    retry_after: float
+
+
+class RateLimitPolicy:
+    """
+    A rate limit of `times` requests per `seconds`, per client IP and route.
+
+    Decorate an endpoint with a policy to apply it; RateLimitMiddleware enforces it.
+    token_bucket allows bursts of `times` refilled continuously, sliding_window
+    allows at most `times` requests in any `seconds`-long window.
+    """
     def __init__(
         self,
         times: int = 5,  # Number of requests allowed
         seconds: int = 60,  # Time window in seconds
-        prefix: str = "rate_limit"  # Prefix for rate limit key
+        prefix: str = "rate_limit",  # Prefix for rate limit key
+        algorithm: str = TOKEN_BUCKET
     ):
+        if algorithm not in (TOKEN_BUCKET, SLIDING_WINDOW):
+            raise ValueError(f"Unknown rate limit algorithm: {algorithm}")
         self.times = times
         self.seconds = seconds
         self.prefix = prefix
+        self.algorithm = algorithm
+
+    def __call__(self, func: Callable) -> Callable:
+        """Attach the policy to an endpoint."""
+        func.rate_limit_policy = self
+        return func
 
-    def _generate_key(self, request: Request) -> str:
-        """Generate a unique key for the rate limit."""
-        # Get the client's IP address
-        forwarded = request.headers.get("X-Forwarded-For")
-        if forwarded:
-            ip = forwarded.split(",")[0]
-        else:
-            ip = request.client.host
-        
-        # Include the endpoint path in the key
-        path = request.url.path
-        
-        return f"{self.prefix}:{ip}:{path}"
-
-    async def is_rate_limited(self, key: str) -> bool:
-        """Check if the request should be rate limited."""
-        now = int(time.time())
-        
-        if key not in rate_limit_store:
-            rate_limit_store[key] = {"count": 1, "reset_time": now + self.seconds}
-            return False
-            
-        # Get the current count and reset time
-        info = rate_limit_store[key]
-        
-        # If the reset time has passed, reset the counter
-        if now > info["reset_time"]:
-            info["count"] = 1
-            info["reset_time"] = now + self.seconds
-            return False
-            
-        # Increment the counter and check if it exceeds the limit
-        info["count"] += 1
-        if info["count"] > self.times:
-            return True
-            
-        return False
+
+class QuotaCost:
+    """
+    What a request to an endpoint costs against the user's quota.
+
+    `units` is charged before the request runs and must be available. The
+    variable part, per_row for each row the endpoint reports with record_rows()
+    and per_kib for each KiB of response body, is charged once the response is
+    sent and may leave the user in debt, delaying their next requests.
+    """
+    def __init__(self, units: float = 1, per_row: float = 0, per_kib: float = 0):
+        self.units = units
+        self.per_row = per_row
+        self.per_kib = per_kib
 
     def __call__(self, func: Callable) -> Callable:
-        """Decorator for rate limiting endpoints."""
-        @wraps(func)
-        async def wrapper(*args, request: Request, **kwargs):
-            key = self._generate_key(request)
-            
-            # Check rate limit
-            is_limited = await self.is_rate_limited(key)
-            if is_limited:
-                reset_time = rate_limit_store[key]["reset_time"]
-                wait_time = reset_time - int(time.time())
-                
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail={
-                        "message": "Too many requests",
-                        "wait_seconds": wait_time
-                    }
-                )
-                
-            # Add rate limit headers
-            headers = {
-                "X-RateLimit-Limit": str(self.times),
-                "X-RateLimit-Remaining": str(
-                    self.times - rate_limit_store[key]["count"]
-                ),
-                "X-RateLimit-Reset": str(rate_limit_store[key]["reset_time"])
-            }
-            
-            # Execute the endpoint function
-            response = await func(*args, request=request, **kwargs)
-            
-            # If the response is a JSONResponse, add the headers
-            if isinstance(response, JSONResponse):
-                response.headers.update(headers)
-                
-            return response
-            
-        return wrapper
-
-# Create rate limiters with different configurations
-aggressive_limiter = RateLimiter(times=3, seconds=60, prefix="aggressive")  # 3 requests per minute
-normal_limiter = RateLimiter(times=10, seconds=60, prefix="normal")  # 10 requests per minute
-relaxed_limiter = RateLimiter(times=30, seconds=60, prefix="relaxed")  # 30 requests per minute
+        """Attach the cost to an endpoint."""
+        func.quota_cost = self
+        return func
+
+
+def record_rows(request, rows: int):
+    """Report rows scanned or written by a request, charged at the endpoint's QuotaCost.per_row."""
+    request.scope.setdefault("state", {})
+    request.scope["state"]["quota_rows"] = request.scope["state"].get("quota_rows", 0) + rows
+
+
+class MemoryRateLimitBackend:
+    """
+    Limiter state in this process, for at most max_keys clients.
+
+    Entries are kept in least recently used order, so idle clients are swept
+    from the front and the oldest are evicted first when the cap is reached.
+    """
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        # key -> [seconds until fully restored, last seen, algorithm state]
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+
+    async def hit(self, key: str, policy: RateLimitPolicy, now: float, cost: float = 1, force: bool = False) -> RateLimitResult:
+        entry = self._entries.get(key)
+        if entry is None:
+            if policy.algorithm == TOKEN_BUCKET:
+                # A bucket in full debt takes two windows to refill
+                idle_seconds, state = 2 * policy.seconds, [float(policy.times), now]
+            else:
+                idle_seconds, state = policy.seconds, deque(maxlen=policy.times)
+            entry = self._entries[key] = [idle_seconds, now, state]
+            if len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+            entry[1] = now
+        state = entry[2]
+
+        if policy.algorithm == TOKEN_BUCKET:
+            rate = policy.times / policy.seconds
+            tokens = min(policy.times, state[0] + (now - state[1]) * rate)
+            state[1] = now
+            # A request costing more than the whole bucket is allowed once it is full
+            needed = min(cost, policy.times)
+            if tokens < needed and not force:
+                state[0] = tokens
+                return RateLimitResult(False, 0, (needed - tokens) / rate)
+            # Debt is bounded to one full window
+            state[0] = max(-policy.times, tokens - cost)
+            return RateLimitResult(True, max(0, int(state[0])), 0)
+
+        while state and state[0] <= now - policy.seconds:
+            state.popleft()
+        if len(state) >= policy.times:
+            return RateLimitResult(False, 0, state[0] + policy.seconds - now)
+        state.append(now)
+        return RateLimitResult(True, policy.times - len(state), 0)
+
+    def sweep(self, now: float) -> int:
+        """Drop clients idle long enough for their limit to be fully restored. Returns how many."""
+        swept = 0
+        while self._entries:
+            seconds, last_seen, _ = next(iter(self._entries.values()))
+            if last_seen + seconds > now:
+                break
+            self._entries.popitem(last=False)
+            swept += 1
+        return swept
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Both scripts take KEYS[1] = key and ARGV = limit, window seconds, now, request id, cost, force
+TOKEN_BUCKET_SCRIPT = """
+local limit, window, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local cost, force = tonumber(ARGV[5]), ARGV[6] == '1'
+local rate = limit / window
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = math.min(limit, (tonumber(state[1]) or limit) + (now - (tonumber(state[2]) or now)) * rate)
+local allowed = 0
+if force or tokens >= math.min(cost, limit) then
+    tokens = math.max(-limit, tokens - cost)
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(2 * window))
+return {allowed, tostring(tokens)}
+"""
+SLIDING_WINDOW_SCRIPT = """
+local limit, window, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+if count < limit then
+    redis.call('ZADD', KEYS[1], now, ARGV[4])
+    redis.call('EXPIRE', KEYS[1], math.ceil(window))
+    return {1, tostring(limit - count - 1)}
+end
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return {0, tostring(tonumber(oldest[2]) + window - now)}
+"""
+
+
+class RedisRateLimitBackend:
+    """Limiter state in a Redis-compatible server, shared by all workers. Needs the redis package."""
+    def __init__(self, url: str):
+        # Only this backend needs redis, so it is not a dependency of the app
+        import redis.asyncio as redis
+        self.client = redis.from_url(url)
+        self._token_bucket = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+        self._sliding_window = self.client.register_script(SLIDING_WINDOW_SCRIPT)
+
+    async def hit(self, key: str, policy: RateLimitPolicy, now: float, cost: float = 1, force: bool = False) -> RateLimitResult:
+        args = [policy.times, policy.seconds, now, uuid.uuid4().hex, cost, "1" if force else "0"]
+        if policy.algorithm == TOKEN_BUCKET:
+            allowed, tokens = await self._token_bucket(keys=[key], args=args)
+            tokens = float(tokens)
+            if allowed:
+                return RateLimitResult(True, max(0, int(tokens)), 0)
+            return RateLimitResult(False, 0, (min(cost, policy.times) - tokens) * policy.seconds / policy.times)
+        allowed, value = await self._sliding_window(keys=[key], args=args)
+        if allowed:
+            return RateLimitResult(True, int(value), 0)
+        return RateLimitResult(False, 0, float(value))
+
+    def sweep(self, now: float) -> int:
+        # Keys expire in Redis
+        return 0
+
+
+class RateLimiter:
+    """
+    Applies the rate limit policies and quota costs of the routes, with state in
+    the backend selected by RATE_LIMIT_BACKEND.
+
+    Quotas are per user id, taken from the bearer token (per IP without one),
+    and refill at `quota.times` units per `quota.seconds`.
+    """
+    def __init__(self, backend, quota: RateLimitPolicy):
+        if quota.algorithm != TOKEN_BUCKET:
+            raise ValueError("Quotas need a token bucket policy")
+        self.backend = backend
+        self.quota = quota
+        self._task: Optional[asyncio.Task] = None
+        # The app whose route limits are resolved below (see _resolve_routes)
+        self._routes_app = None
+        self._static_routes: Dict[Tuple[str, str], tuple] = {}
+        self._dynamic_routes: List[tuple] = []
+        self.rejected = metrics.counter("rate_limit_rejected_total", "Requests rejected with 429", ("reason",))
+        if isinstance(backend, MemoryRateLimitBackend):
+            metrics.callback("rate_limit_tracked_keys", "Clients tracked by the in-memory rate limiter", lambda: {(): len(backend)})
+
+    @staticmethod
+    def client_ip(scope) -> str:
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @staticmethod
+    def quota_key(scope) -> str:
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer":
+                    # Verified tokens are cached, so this rarely decodes the token
+                    token_data = verify_token(token)
+                    if token_data is not None:
+                        return f"user:{token_data.user_id}"
+                break
+        return f"ip:{RateLimiter.client_ip(scope)}"
+
+    def _resolve_routes(self, app):
+        """
+        Resolve the policy and quota cost of each of app's routes once.
+
+        Routes without path parameters are looked up by method and path; the
+        others, and any a parametrized route declared before them would match
+        first, are tried in order as the router would.
+        """
+        self._static_routes, self._dynamic_routes = {}, []
+        for route in app.router.routes:
+            endpoint = getattr(route, "endpoint", None)
+            limits = (route, getattr(endpoint, "rate_limit_policy", None), getattr(endpoint, "quota_cost", None))
+            path, methods = getattr(route, "path", None), getattr(route, "methods", None)
+            if path and methods and "{" not in path and not any(
+                earlier.matches({"type": "http", "path": path, "root_path": "", "method": method})[0] == Match.FULL
+                for earlier, _, _ in self._dynamic_routes for method in methods
+            ):
+                for method in methods:
+                    self._static_routes.setdefault((method, path), limits)
+            else:
+                self._dynamic_routes.append(limits)
+        self._routes_app = app
+
+    def route_limits(self, scope):
+        """The route matching a request with its policy and quota cost, or (None, None, None)."""
+        app = scope.get("app")
+        if app is None:
+            return None, None, None
+        if app is not self._routes_app:
+            self._resolve_routes(app)
+        # Routes match the path below the root path the app is served at
+        path, root_path = scope["path"], scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        limits = self._static_routes.get((scope["method"], path))
+        if limits is not None:
+            return limits
+        for limits in self._dynamic_routes:
+            match, _ = limits[0].matches(scope)
+            if match == Match.FULL:
+                return limits
+        return None, None, None
+
+    async def check(self, key: str, policy: RateLimitPolicy, cost: float = 1, force: bool = False) -> RateLimitResult:
+        try:
+            return await self.backend.hit(key, policy, time.time(), cost, force)
+        except Exception as e:
+            # An unavailable shared backend must not take the API down with it
+            logger.error(f"Rate limiter backend error, allowing request: {e}")
+            return RateLimitResult(True, policy.times, 0)
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(RATE_LIMIT_SWEEP_SECONDS)
+            swept = self.backend.sweep(time.time())
+            if swept:
+                logger.debug(f"Swept {swept} idle rate limit keys")
+
+    async def start(self):
+        """Sweep idle clients in the background."""
+        self._task = asyncio.create_task(self._sweep_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+async def _send_too_many_requests(send, headers: list, retry_after: float, message: str):
+    wait_seconds = math.ceil(retry_after)
+    body = json.dumps({"detail": {"message": message, "wait_seconds": wait_seconds}}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": headers + [
+            (b"retry-after", str(wait_seconds).encode()),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    """ASGI middleware enforcing the rate limit policy and quota cost of the requested route, if any."""
+    def __init__(self, app, limiter: "RateLimiter" = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        route, policy, cost = self.limiter.route_limits(scope)
+        if route is not None:
+            # As the router would, so that requests rejected here are still labelled by route
+            scope["route"] = route
+        if policy is None and cost is None:
+            return await self.app(scope, receive, send)
+
+        headers = []
+        if policy is not None:
+            key = f"{policy.prefix}:{self.limiter.client_ip(scope)}:{route.path}"
+            result = await self.limiter.check(key, policy)
+            headers += [
+                (b"x-ratelimit-limit", str(policy.times).encode()),
+                (b"x-ratelimit-remaining", str(result.remaining).encode()),
+            ]
+            if not result.allowed:
+                self.limiter.rejected.inc(("rate_limit",))
+                return await _send_too_many_requests(send, headers, result.retry_after, "Too many requests")
+
+        if cost is not None:
+            quota_key = f"{self.limiter.quota.prefix}:{self.limiter.quota_key(scope)}"
+            result = await self.limiter.check(quota_key, self.limiter.quota, cost.units)
+            headers += [
+                (b"x-quota-limit", str(self.limiter.quota.times).encode()),
+                (b"x-quota-remaining", str(result.remaining).encode()),
+            ]
+            if not result.allowed:
+                self.limiter.rejected.inc(("quota",))
+                return await _send_too_many_requests(send, headers, result.retry_after, "Quota exceeded")
+
+        body_bytes = 0
+
+        async def send_with_headers(message):
+            nonlocal body_bytes
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + headers
+            elif message["type"] == "http.response.body":
+                body_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            if cost is not None and (cost.per_row or cost.per_kib):
+                rows = scope.get("state", {}).get("quota_rows", 0)
+                variable = cost.per_row * rows + cost.per_kib * body_bytes / 1024
+                if variable:
+                    await self.limiter.check(quota_key, self.limiter.quota, variable, force=True)
+
+
+def _create_backend():
+    if RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimitBackend(REDIS_URL)
+    return MemoryRateLimitBackend(RATE_LIMIT_MAX_KEYS)
+
+
+# Create a global instance
+rate_limiter = RateLimiter(
+    _create_backend(),
+    RateLimitPolicy(times=USER_QUOTA_UNITS, seconds=USER_QUOTA_SECONDS, prefix="quota")
+)
+
+# Route policies; decorate an endpoint with one of these to limit it
+aggressive_limiter = RateLimitPolicy(times=3, seconds=60, prefix="aggressive", algorithm=SLIDING_WINDOW)  # 3 requests per minute
+normal_limiter = RateLimitPolicy(times=10, seconds=60, prefix="normal")  # 10 requests per minute
+relaxed_limiter = RateLimitPolicy(times=30, seconds=60, prefix="relaxed")  # 30 requests per minute
@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+from pymongo import ASCENDING, IndexModel
+from app.core.database import db
+
+logger = logging.getLogger(__name__)
+
+# Where revocations are stored: "mongo" (shared, default), "redis" (shared) or "memory" (single process)
+REVOCATION_BACKEND = os.getenv("REVOCATION_BACKEND", "mongo").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Revocations the Bloom filter holds at REVOCATION_ERROR_RATE false positives before it is rebuilt
+REVOCATION_CAPACITY = int(os.getenv("REVOCATION_CAPACITY", "100000"))
+REVOCATION_ERROR_RATE = float(os.getenv("REVOCATION_ERROR_RATE", "0.001"))
+# How often revocations made by other workers are picked up
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "5"))
+# How often the Bloom filter is rebuilt to drop expired revocations
+REVOCATION_REBUILD_SECONDS = float(os.getenv("REVOCATION_REBUILD_SECONDS", "3600"))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of strings: no false negatives, error_rate false positives at capacity."""
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class MemoryRevocationBackend:
+    """Revocations kept in this process only; for development and single-worker deployments."""
+    def __init__(self):
+        self._revoked = {}  # jti -> (exp, revoked_at)
+
+    async def ensure_indexes(self):
+        pass
+
+    async def add(self, jti: str, exp: float, revoked_at: float):
+        now = time.time()
+        for expired in [key for key, (key_exp, _) in self._revoked.items() if key_exp <= now]:
+            del self._revoked[expired]
+        self._revoked[jti] = (exp, revoked_at)
+
+    async def contains(self, jti: str) -> bool:
+        entry = self._revoked.get(jti)
+        return entry is not None and entry[0] > time.time()
+
+    async def revoked_since(self, since: float) -> List[str]:
+        now = time.time()
+        return [jti for jti, (exp, revoked_at) in self._revoked.items() if exp > now and revoked_at >= since]
+
+
+class MongoRevocationBackend:
+    """
+    Revocations in the revoked_tokens collection, shared by all workers.
+
+    A TTL index deletes each revocation once its token has expired.
+    """
+    INDEXES = [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        IndexModel([("revoked_at", ASCENDING)], name="revoked_at"),
+    ]
+
+    def __init__(self):
+        self.db = db
+
+    @property
+    def collection(self):
+        return self.db.db.revoked_tokens if hasattr(self.db, 'db') and self.db.db is not None else None
+
+    async def ensure_indexes(self):
+        if self.collection is None:
+            raise Exception("Database not initialized")
+        await self.collection.create_indexes(self.INDEXES)
+
+    async def add(self, jti: str, exp: float, revoked_at: float):
+        if self.collection is None:
+            raise Exception("Database not initialized")
+        await self.collection.replace_one(
+            {"_id": jti},
+            {
+                "expires_at": datetime.fromtimestamp(exp, timezone.utc),
+                "revoked_at": datetime.fromtimestamp(revoked_at, timezone.utc)
+            },
+            upsert=True
+        )
+
+    async def contains(self, jti: str) -> bool:
+        if self.collection is None:
+            raise Exception("Database not initialized")
+        # The TTL monitor runs once a minute, so also check the expiry
+        return await self.collection.count_documents(
+            {"_id": jti, "expires_at": {"$gt": datetime.now(timezone.utc)}}, limit=1
+        ) > 0
+
+    async def revoked_since(self, since: float) -> List[str]:
+        if self.collection is None:
+            raise Exception("Database not initialized")
+        cursor = self.collection.find({
+            "revoked_at": {"$gte": datetime.fromtimestamp(since, timezone.utc)},
+            "expires_at": {"$gt": datetime.now(timezone.utc)}
+        }, {"_id": 1})
+        return [document["_id"] async for document in cursor]
+
+
+class RedisRevocationBackend:
+    """
+    Revocations in a Redis-compatible server, shared by all workers.
+
+    Each revocation is a key expiring with its token; a sorted set scored by
+    revocation time lets workers fetch the recent ones. Needs the redis package.
+    """
+    KEY_PREFIX = "revoked_token:"
+    RECENT_KEY = "revoked_tokens"
+
+    def __init__(self, url: str, retention_seconds: float):
+        # Only this backend needs redis, so it is not a dependency of the app
+        import redis.asyncio as redis
+        self.client = redis.from_url(url)
+        self.retention_seconds = retention_seconds
+
+    async def ensure_indexes(self):
+        pass
+
+    async def add(self, jti: str, exp: float, revoked_at: float):
+        async with self.client.pipeline(transaction=False) as pipeline:
+            pipeline.set(self.KEY_PREFIX + jti, 1, exat=int(math.ceil(exp)))
+            pipeline.zadd(self.RECENT_KEY, {jti: revoked_at})
+            # Tokens revoked longer ago than the longest token lifetime have expired
+            pipeline.zremrangebyscore(self.RECENT_KEY, "-inf", revoked_at - self.retention_seconds)
+            await pipeline.execute()
+
+    async def contains(self, jti: str) -> bool:
+        return await self.client.exists(self.KEY_PREFIX + jti) > 0
+
+    async def revoked_since(self, since: float) -> List[str]:
+        return [jti.decode() for jti in await self.client.zrangebyscore(self.RECENT_KEY, since, "+inf")]
+
+
+class RevocationStore:
+    """
+    Revoked token ids (jti), each kept until its token expires.
+
+    Membership is checked against an in-process Bloom filter first, so the usual
+    answer (not revoked) costs microseconds and no I/O; only filter hits are
+    confirmed with the backend. Revocations from this worker are visible
+    immediately, those from other workers once the background sync picks them
+    up (every REVOCATION_SYNC_SECONDS).
+    """
+    def __init__(self, backend, capacity: int, error_rate: float):
+        self.backend = backend
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._synced_at = 0.0
+        self._rebuilt_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        # Revocations made by this worker while the Bloom filter is being rebuilt
+        self._rebuilding: Optional[List[str]] = None
+
+    async def revoke(self, jti: str, exp: float):
+        """Revoke a token id until exp (a Unix timestamp)."""
+        self._bloom.add(jti)
+        if self._rebuilding is not None:
+            self._rebuilding.append(jti)
+        await self.backend.add(jti, exp, time.time())
+
+    async def is_revoked(self, jti: str) -> bool:
+        if jti not in self._bloom:
+            return False
+        return await self.backend.contains(jti)
+
+    async def sync(self):
+        """Add revocations made since the last sync to the Bloom filter, rebuilding it when due."""
+        now = time.time()
+        if now - self._rebuilt_at >= REVOCATION_REBUILD_SECONDS or self._bloom.count >= self.capacity:
+            self._rebuilding = []
+            try:
+                jtis = await self.backend.revoked_since(0)
+                bloom = BloomFilter(max(self.capacity, 2 * len(jtis)), self.error_rate)
+                for jti in jtis + self._rebuilding:
+                    bloom.add(jti)
+            finally:
+                self._rebuilding = None
+            self._bloom = bloom
+            self._rebuilt_at = now
+        else:
+            # Overlap the previous sync to allow for clock differences between workers
+            for jti in await self.backend.revoked_since(self._synced_at - REVOCATION_SYNC_SECONDS):
+                self._bloom.add(jti)
+        self._synced_at = now
+
+    async def _sync_forever(self):
+        while True:
+            await asyncio.sleep(REVOCATION_SYNC_SECONDS)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Error syncing token revocations: {e}")
+
+    async def start(self):
+        """Load the current revocations and keep syncing them in the background."""
+        await self.backend.ensure_indexes()
+        await self.sync()
+        self._task = asyncio.create_task(self._sync_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def create_revocation_store(max_token_lifetime_seconds: float) -> RevocationStore:
+    """A RevocationStore on the backend selected by REVOCATION_BACKEND."""
+    if REVOCATION_BACKEND == "redis":
+        backend = RedisRevocationBackend(REDIS_URL, max_token_lifetime_seconds)
+    elif REVOCATION_BACKEND == "memory":
+        backend = MemoryRevocationBackend()
+    else:
+        backend = MongoRevocationBackend()
+    return RevocationStore(backend, REVOCATION_CAPACITY, REVOCATION_ERROR_RATE)
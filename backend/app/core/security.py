@@ -1,29 +1,55 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from functools import lru_cache
+from typing import Callable, Optional, TypeVar
 from jose import JWTError, jwt
 from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from pydantic import BaseModel
 import os
-from dotenv import load_dotenv
+from app.core.cache import TTLCache
+from app.core.metrics import metrics
+from app.core.revocation import create_revocation_store
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# Configure Argon2 with recommended parameters
-pwd_context = CryptContext(
-    schemes=["argon2"],
-    deprecated="auto",
-    argon2__time_cost=2,        # Number of iterations
-    argon2__memory_cost=102400,  # Memory usage in kibibytes (100 MB)
-    argon2__parallelism=8       # Number of parallel threads
-)
+# Argon2 parameters; run calibrate_argon2.py to pick values for the host.
+# Stored hashes made with other parameters are rehashed on the next login.
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "2"))            # Number of iterations
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "102400"))   # Memory usage in kibibytes (100 MB)
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "8"))        # Number of parallel threads
+
+@lru_cache(maxsize=None)
+def password_context():
+    """The passlib context hashing passwords, created on first use."""
+    # passlib and argon2 are only needed by password logins, so they are not loaded at startup
+    from passlib.context import CryptContext
+    return CryptContext(
+        schemes=["argon2"],
+        deprecated="auto",
+        argon2__time_cost=ARGON2_TIME_COST,
+        argon2__memory_cost=ARGON2_MEMORY_COST,
+        argon2__parallelism=ARGON2_PARALLELISM
+    )
 
 # JWT Configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "development_secret_key_123")  # Make sure to set this in .env
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
+# Verified tokens kept so repeated requests skip jwt.decode
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# Opt-in: access tokens carry the principal (id, is_active, is_verified), so
+# authenticating a request needs no database lookup. Changes to a user then
+# only apply to tokens issued afterwards (at the latest on refresh).
+AUTH_CLAIMS_MODE = os.getenv("AUTH_CLAIMS_MODE", "false").lower() in ("1", "true", "yes")
 
 # OAuth2 scheme for token handling
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -35,14 +61,153 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     user_id: str
+    # Token id checked against the revocation store (a digest of the token for tokens issued without one)
+    jti: str
+    token_type: Optional[str] = None
+    # Principal claims, only present in tokens issued in AUTH_CLAIMS_MODE
+    is_active: Optional[bool] = None
+    is_verified: Optional[bool] = None
+
+    @property
+    def has_principal(self) -> bool:
+        return self.is_active is not None and self.is_verified is not None
+
+T = TypeVar("T")
+
+# Memory the password hashes may use at once; caps the concurrent hashes at budget / memory_cost
+PASSWORD_HASH_MEMORY_BUDGET_MB = int(os.getenv("PASSWORD_HASH_MEMORY_BUDGET_MB", "512"))
+# Hashes waiting for a worker before new ones are rejected
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+# Hash latencies kept for the reported percentiles
+PASSWORD_HASH_LATENCY_WINDOW = 1000
+
+
+class PasswordHashPoolFull(HTTPException):
+    """Raised when too many password hashes are already waiting for a worker."""
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+
+
+class PasswordHashPool:
+    """
+    Runs password hashing and verification in dedicated worker threads.
+
+    Argon2 releases the GIL, so hashing in threads keeps the event loop serving
+    other requests. At most max_workers hashes run at once, which bounds their
+    memory use; up to max_queue more wait for a worker, and any beyond that are
+    rejected immediately with PasswordHashPoolFull (503) instead of piling up.
+    A hash holds its place until it is done, even if its caller stops waiting
+    (e.g. on a client disconnect), since it still occupies a worker or the queue.
+    """
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        # Guards the counters, which hashes finishing on the workers update
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+        self._completed = 0
+        self._latencies = deque(maxlen=PASSWORD_HASH_LATENCY_WINDOW)
+        self._latency_histogram = metrics.histogram(
+            "password_hash_duration_seconds", "Time to hash or verify a password, including the wait for a worker"
+        )
+        metrics.callback("password_hash_queue_depth", "Password hashes waiting for a worker", lambda: {(): self.queue_depth})
+        metrics.callback("password_hash_in_flight", "Password hashes running or waiting", lambda: {(): self._in_flight})
+        metrics.callback(
+            "password_hash_rejected_total", "Password hashes rejected because the queue was full",
+            lambda: {(): self._rejected}, type="counter"
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of hashes waiting for a worker."""
+        return max(0, self._in_flight - self.max_workers)
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """Run func(*args) on a worker, raising PasswordHashPoolFull if the queue is full."""
+        with self._lock:
+            full = self._in_flight >= self.max_workers + self.max_queue
+            if full:
+                self._rejected += 1
+            else:
+                self._in_flight += 1
+        if full:
+            logger.warning(f"Password hash queue full ({self.queue_depth} waiting), rejecting request")
+            raise PasswordHashPoolFull()
+
+        started = time.perf_counter()
+        future = self._executor.submit(func, *args)
+        # Released when the hash is done, not when the caller stops waiting: cancelling the
+        # caller only cancels a hash still waiting for a worker, a running one carries on
+        future.add_done_callback(lambda done: self._release(done, started))
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future: Future, started: float):
+        # Runs on the worker thread, or on the caller's when a waiting hash is cancelled
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled():
+                return
+            self._completed += 1
+            # Includes the time spent waiting for a worker
+            self._latencies.append(elapsed)
+        self._latency_histogram.observe(elapsed)
+
+    def stats(self) -> dict:
+        """Current queue depth and latency (in seconds) of the recent hashes."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else None
+
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+            "latency_max": latencies[-1] if latencies else None,
+        }
+
+
+def _password_hash_workers() -> int:
+    """Concurrent hashes allowed by the memory budget and the CPU count."""
+    hash_memory_mb = ARGON2_MEMORY_COST // 1024
+    by_memory = PASSWORD_HASH_MEMORY_BUDGET_MB // max(1, hash_memory_mb)
+    return max(1, min(by_memory, os.cpu_count() or 1))
+
+
+password_hash_pool = PasswordHashPool(_password_hash_workers(), PASSWORD_HASH_MAX_QUEUE)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verify a password against a hash. Blocks for the full hash time; use verify_password_async in handlers."""
+    return password_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    """Generate password hash."""
-    return pwd_context.hash(password)
+    """Generate password hash. Blocks for the full hash time; use get_password_hash_async in handlers."""
+    return password_context().hash(password)
+
+def password_needs_update(hashed_password: str) -> bool:
+    """Whether a stored hash was made with other parameters than the configured ones."""
+    return password_context().needs_update(hashed_password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against a hash on the password hash pool."""
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Generate password hash on the password hash pool."""
+    return await password_hash_pool.run(get_password_hash, password)
 
 def create_access_token(data: dict) -> str:
     """Create access token."""
@@ -60,26 +225,64 @@ def create_refresh_token(data: dict) -> str:
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Verified tokens by digest, each kept until the token expires
+token_cache = TTLCache[TokenData](TOKEN_CACHE_SIZE, ACCESS_TOKEN_EXPIRE_MINUTES * 60, name="tokens")
+# Revoked token ids, shared by all workers (see app/core/revocation.py)
+revocation_store = create_revocation_store(REFRESH_TOKEN_EXPIRE_DAYS * 86400)
+
+def _token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+async def revoke_token(token: str):
+    """Reject a token from now on, until it expires anyway. Invalid tokens are ignored."""
+    token_data = verify_token(token)
+    if token_data is None:
+        return
+    exp = jwt.get_unverified_claims(token).get("exp") or time.time() + REFRESH_TOKEN_EXPIRE_DAYS * 86400
+    await revocation_store.revoke(token_data.jti, exp)
+
+async def is_token_revoked(token_data: TokenData) -> bool:
+    return await revocation_store.is_revoked(token_data.jti)
+
 def verify_token(token: str, is_refresh_token: bool = False) -> Optional[TokenData]:
-    """Verify JWT token."""
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    """Verify JWT token. Results are cached until the token expires; revocation is not checked here."""
+    digest = _token_digest(token)
+    token_data = token_cache.get(digest)
+    if token_data is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
         user_id: str = payload.get("sub")
         if user_id is None:
             return None
-            
-        # For refresh tokens, verify the token type
-        if is_refresh_token and payload.get("token_type") != "refresh":
-            return None
-            
-        return TokenData(user_id=user_id)
-    except JWTError:
+        token_data = TokenData(
+            user_id=user_id,
+            jti=payload.get("jti") or digest.hex(),
+            token_type=payload.get("token_type"),
+            is_active=payload.get("is_active"),
+            is_verified=payload.get("is_verified")
+        )
+        if "exp" in payload:
+            token_cache.set(digest, token_data, ttl_seconds=payload["exp"] - time.time())
+
+    # For refresh tokens, verify the token type
+    if is_refresh_token and token_data.token_type != "refresh":
         return None
 
-def create_tokens(user_id: str) -> dict:
-    """Create access and refresh tokens."""
-    access_token_data = {"sub": user_id, "token_type": "access"}
-    refresh_token_data = {"sub": user_id, "token_type": "refresh"}
+    return token_data
+
+def create_tokens(user_id: str, principal: Optional[BaseModel] = None) -> dict:
+    """
+    Create access and refresh tokens.
+
+    In AUTH_CLAIMS_MODE, pass the user as principal to embed its is_active and
+    is_verified in the access token.
+    """
+    access_token_data = {"sub": user_id, "token_type": "access", "jti": uuid.uuid4().hex}
+    refresh_token_data = {"sub": user_id, "token_type": "refresh", "jti": uuid.uuid4().hex}
+    if AUTH_CLAIMS_MODE and principal is not None:
+        access_token_data.update(is_active=principal.is_active, is_verified=principal.is_verified)
     
     return {
         "access_token": create_access_token(access_token_data),
@@ -0,0 +1,91 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Optional, TypeVar
+from app.core.metrics import metrics
+
+V = TypeVar("V")
+
+
+# Named groups, exported on /metrics
+_named_groups: Dict[str, "SingleFlight"] = {}
+metrics.callback(
+    "singleflight_calls_total", "Calls that ran, each one round trip",
+    lambda: {(name,): group.calls for name, group in _named_groups.items()}, ("group",), "counter"
+)
+metrics.callback(
+    "singleflight_shared_total", "Calls that joined an identical call in flight, each one round trip saved",
+    lambda: {(name,): group.shared for name, group in _named_groups.items()}, ("group",), "counter"
+)
+metrics.callback(
+    "singleflight_in_flight", "Calls currently in flight",
+    lambda: {(name,): len(group._futures) for name, group in _named_groups.items()}, ("group",)
+)
+
+
+class SingleFlight(Generic[V]):
+    """
+    Coalesces concurrent calls with the same key into one.
+
+    The first caller for a key runs the call itself; callers arriving while it
+    is in flight await the same result (or exception) instead of starting their
+    own. Once it completes the key is free again, so nothing is cached: pair it
+    with a TTLCache for that. All callers get the same object, which must
+    therefore not be modified. If the caller running the call is cancelled
+    (e.g. on a client disconnect), the others start it again rather than fail.
+    """
+    def __init__(self, name: Optional[str] = None):
+        if name is not None:
+            _named_groups[name] = self
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[V]]) -> V:
+        """The result of func(), shared with concurrent callers of the same key."""
+        while True:
+            future = self._futures.get(key)
+            if future is None:
+                break
+            self.shared += 1
+            try:
+                # Shielded, so that cancelling this caller does not cancel the result for the others
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.cancelled() and not asyncio.current_task().cancelling():
+                    # The caller running the call was cancelled, not this one: run it again
+                    self.shared -= 1
+                    continue
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._futures[key] = future
+        self.calls += 1
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Marks the exception as retrieved, so asyncio does not log it when no one else awaited it
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+    def forget(self, key: Hashable):
+        """Let the next call for key start a new call, e.g. after a write made the one in flight stale."""
+        self._futures.pop(key, None)
+
+    def stats(self) -> dict:
+        """Calls run and round trips saved since startup."""
+        total = self.calls + self.shared
+        return {
+            "in_flight": len(self._futures),
+            "calls": self.calls,
+            "shared": self.shared,
+            "shared_ratio": self.shared / total if total else None,
+        }
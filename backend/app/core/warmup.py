@@ -0,0 +1,58 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+import orjson
+from jose import jwt
+from app.core.database import db
+from app.core.security import ALGORITHM, SECRET_KEY, create_access_token
+from app.models.transaction import Transaction
+from app.models.user import UserInDB, UserResponse
+from app.schemas.category import CategoryResponse
+from app.schemas.transaction import TransactionPage
+from app.services.transaction_service import to_api_row, to_document
+
+logger = logging.getLogger(__name__)
+
+# Whether the app is warmed up on startup, before it serves its first request
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() in ("1", "true", "yes")
+# MongoDB connections opened by the warm-up, so the first requests do not wait for handshakes
+MONGODB_WARMUP_CONNECTIONS = int(os.getenv("MONGODB_WARMUP_CONNECTIONS", "4"))
+# Seconds the warm-up may take; the app serves anyway afterwards
+STARTUP_WARMUP_TIMEOUT_SECONDS = float(os.getenv("STARTUP_WARMUP_TIMEOUT_SECONDS", "5"))
+
+
+def prime_models():
+    """
+    Run each hot request path's validation and serialization once.
+
+    The first validation of some types loads code lazily (e.g. email address
+    checks), which would otherwise land on the first user's request.
+    """
+    now = datetime.now(timezone.utc)
+    transaction = Transaction(
+        user_id=uuid4(), type="expense", categories=["Warm-up"], amount="1.00", date=now.isoformat()
+    )
+    transaction.model_dump_json()
+    orjson.dumps(TransactionPage(items=[transaction]).model_dump(mode="json"))
+    orjson.dumps([to_api_row(to_document(transaction))])
+    user = UserInDB(email="warmup@example.com", name="Warm", surname="Up", hashed_password="")
+    UserResponse(**user.model_dump()).model_dump_json()
+    CategoryResponse(type="expense", name="Warm-up").model_dump_json()
+    jwt.decode(create_access_token({"sub": str(user.id)}), SECRET_KEY, algorithms=[ALGORITHM])
+
+
+async def warm_up():
+    """Prime MongoDB connections and the request paths; failures are logged, never raised."""
+    started = time.perf_counter()
+    try:
+        prime_models()
+    except Exception as e:
+        logger.error(f"Error priming models: {e}")
+    try:
+        await asyncio.wait_for(db.open_connections(MONGODB_WARMUP_CONNECTIONS), STARTUP_WARMUP_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.error(f"Error opening MongoDB connections: {e!r}")
+    logger.info(f"Warm-up took {(time.perf_counter() - started) * 1000:.0f} ms")
@@ -1,9 +1,11 @@
 import string
 from uuid import UUID
 from typing import List, Optional
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 from datetime import datetime, timezone
+from decimal import Decimal
 from enum import Enum
+from app.core.money import DEFAULT_CURRENCY, to_minor_units
 
 
 
@@ -14,7 +16,9 @@ class Transaction(BaseModel):
         user_id (UUID): The unique identifier for the user.
         type (str): The type of transaction (expense or income).
         categories (List[str]): A list of categories associated with the transaction.
-        amount (float): The amount of money involved in the transaction.
+        amount (Decimal): The amount of money involved in the transaction.
+            Stored as integer minor units (amount_minor), see app.core.money.
+        currency (str): The ISO 4217 code of the amount's currency.
         date (datetime): The date of the transaction in Y-m-d format.
         description (Optional[str]): A brief description of the transaction.
         created_at (datetime): The timestamp when the transaction was created.
@@ -23,7 +27,8 @@ class Transaction(BaseModel):
     user_id: UUID
     type: str
     categories: List[str]  
-    amount: float
+    amount: Decimal
+    currency: str = DEFAULT_CURRENCY
     date: datetime  # Should be in Y-m-d format
     description: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -38,6 +43,20 @@ class Transaction(BaseModel):
             raise ValueError("Transaction type must be either 'income' or 'expense'")
         return v
 
+    @field_validator('currency')
+    @classmethod
+    def validate_currency(cls, v: str) -> str:
+        v = v.upper()
+        if len(v) != 3 or not v.isalpha():
+            raise ValueError("Currency must be a 3-letter ISO 4217 code")
+        return v
+
+    @model_validator(mode='after')
+    def validate_amount_precision(self):
+        # Raises if the amount cannot be stored exactly in the currency's minor units
+        to_minor_units(self.amount, self.currency)
+        return self
+
     @field_validator('date', mode='before')
     @classmethod
     def validate_date(cls, v):
@@ -51,5 +70,6 @@ class Transaction(BaseModel):
     class Config:
         json_encoders = {
             datetime: lambda v: v.strftime('%Y-%m-%d') if hasattr(v, 'strftime') else v,
-            UUID: lambda v: str(v)
+            UUID: lambda v: str(v),
+            Decimal: float
         }
\ No newline at end of file
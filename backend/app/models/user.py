@@ -42,6 +42,12 @@ class UserInDB(UserBase):
             datetime: lambda dt: dt.isoformat()
         }
         
+class Principal(BaseModel):
+    """The authenticated user of a request: the claims of its access token in claims mode, the stored user's otherwise."""
+    id: UUID
+    is_active: bool = True
+    is_verified: bool = False
+
 class UserExistResponse(BaseModel):
     status: str = "user_exist"
     
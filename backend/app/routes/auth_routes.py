@@ -4,12 +4,10 @@ from pydantic import BaseModel, EmailStr
 from typing import Union
 from app.models.user import UserCreate, UserResponse, OAuthInfo, UserExistResponse
 from app.services.auth_service import AuthService, get_auth_service_dependency
-from app.core.security import Token
+from app.core.security import Token, PasswordHashPoolFull
 from app.core.rate_limit import aggressive_limiter, normal_limiter, relaxed_limiter
 import logging
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -75,6 +73,8 @@ async def login(
     try:
         tokens = await auth_service.login(credentials.email, credentials.password)
         return TokenResponse(**tokens)
+    except PasswordHashPoolFull:
+        raise
     except Exception as e:
         logger.error(f"Login failed: {str(e)}")
         raise HTTPException(
@@ -3,7 +3,7 @@ from typing import List
 from app.schemas.category import CategoryCreate, CategoryResponse
 from app.services.category_service import category_service
 from app.routes.user_routes import get_current_user
-from app.models.user import UserInDB
+from app.models.user import Principal
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
@@ -27,13 +27,13 @@ async def get_default_categories():
         )
 
 @router.get("/custom/{user_id}", response_model=List[CategoryResponse])
-async def get_custom_categories(user_id: str, current_user: UserInDB = Depends(get_current_user)):
+async def get_custom_categories(user_id: str, current_user: Principal = Depends(get_current_user)):
     """
     Get all custom categories created by a specific user.
     
     Args:
         user_id (str): The ID of the user whose custom categories to retrieve
-        current_user (UserInDB): The authenticated user (injected by FastAPI)
+        current_user (Principal): The authenticated user (injected by FastAPI)
         
     Returns:
         List[CategoryResponse]: A list of custom categories created by the user
@@ -60,13 +60,13 @@ async def get_custom_categories(user_id: str, current_user: UserInDB = Depends(g
         )
 
 @router.get("/{user_id}", response_model=List[CategoryResponse])
-async def get_all_categories(user_id: str, current_user: UserInDB = Depends(get_current_user)):
+async def get_all_categories(user_id: str, current_user: Principal = Depends(get_current_user)):
     """
     Get all categories (both default and custom) available to a user.
     
     Args:
         user_id (str): The ID of the user
-        current_user (UserInDB): The authenticated user (injected by FastAPI)
+        current_user (Principal): The authenticated user (injected by FastAPI)
         
     Returns:
         List[CategoryResponse]: A list of all categories available to the user
@@ -94,7 +94,7 @@ async def get_all_categories(user_id: str, current_user: UserInDB = Depends(get_
 async def create_custom_category(
     user_id: str, 
     category: CategoryCreate,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Create a new custom category for a specific user.
@@ -102,7 +102,7 @@ async def create_custom_category(
     Args:
         user_id (str): The ID of the user creating the category
         category (CategoryCreate): The category data to create
-        current_user (UserInDB): The authenticated user (injected by FastAPI)
+        current_user (Principal): The authenticated user (injected by FastAPI)
         
     Returns:
         CategoryResponse: The created category
@@ -130,7 +130,7 @@ async def create_custom_category(
 async def delete_custom_category(
     user_id: str, 
     category_name: str,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Delete a custom category for a specific user.
@@ -138,7 +138,7 @@ async def delete_custom_category(
     Args:
         user_id (str): The ID of the user
         category_name (str): The name of the category to delete
-        current_user (UserInDB): The authenticated user (injected by FastAPI)
+        current_user (Principal): The authenticated user (injected by FastAPI)
         
     Returns:
         dict: A message confirming successful deletion
@@ -1,9 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from typing import List, Optional
+from datetime import datetime
+from decimal import Decimal
 from app.models.transaction import Transaction
-from app.services.transaction_service import transaction_service
+from app.schemas.transaction import (
+    TransactionPage, ImportFormat, ImportReport, SummaryBucket, SummaryGroupBy, ExportFormat,
+    TransactionFilters, TransactionSort, TransactionType
+)
+from app.services.transaction_import import parse_csv, parse_ofx
+from app.services.transaction_export import csv_chunks, parquet_chunks
+from app.services.transaction_service import transaction_service, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from app.routes.user_routes import get_current_user
-from app.models.user import UserInDB
+from app.core.rate_limit import QuotaCost, record_rows
+from app.models.user import Principal
 import traceback
+import orjson
 from uuid import UUID
 from fastapi import Response
 
@@ -11,7 +23,8 @@ router = APIRouter()
 
 
 @router.post("/transactions/create")
-async def create_transaction(transaction: Transaction, current_user: UserInDB = Depends(get_current_user)):
+@QuotaCost(units=1)
+async def create_transaction(transaction: Transaction, current_user: Principal = Depends(get_current_user)):
     """
     Create a new financial transaction.
     
@@ -21,7 +34,7 @@ async def create_transaction(transaction: Transaction, current_user: UserInDB =
             - category: Category of the transaction
             - description: Optional description
             - date: Date of the transaction
-        current_user (UserInDB): The authenticated user (injected by FastAPI)
+        current_user (Principal): The authenticated user (injected by FastAPI)
     
     Returns:
         dict: A message confirming successful creation and the transaction ID
@@ -45,19 +58,92 @@ async def create_transaction(transaction: Transaction, current_user: UserInDB =
         )
 
 
-@router.get("/transactions/user/{user_id}")
-async def get_user_transactions(user_id: UUID, current_user: UserInDB = Depends(get_current_user)):
+@router.post("/transactions/import", response_model=ImportReport)
+@QuotaCost(units=10, per_row=0.01)
+async def import_transactions(
+    request: Request,
+    file_format: ImportFormat = Query(ImportFormat.CSV, alias="format"),
+    current_user: Principal = Depends(get_current_user)
+):
     """
-    Get all transactions for a specific user.
+    Import transactions from a bank export sent as the raw request body.
+    
+    The body is parsed while it is being received and rows are inserted in
+    batches, so files of any size can be imported. Invalid rows are skipped
+    and listed in the report.
     
     Args:
+        request (Request): The request whose body is the CSV or OFX file
+        file_format (ImportFormat): "csv" (default) or "ofx", passed as the format query parameter
+        current_user (Principal): The authenticated user (injected by FastAPI)
+        
+    Returns:
+        ImportReport: Number of inserted and failed rows, with the error of each failed row
+        
+    Raises:
+        HTTPException (400): If the file cannot be parsed
+        HTTPException (401): If user is not authenticated
+        HTTPException (500): If there's an error importing the transactions
+    """
+    parser = parse_ofx if file_format == ImportFormat.OFX else parse_csv
+    try:
+        report = await transaction_service.import_transactions(current_user.id, parser(request.stream()))
+        record_rows(request, report.inserted + report.failed)
+        return report
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Error parsing import file: {str(e)}")
+    except Exception as e:
+        error_trace = traceback.format_exc()
+        print(f"Error in import_transactions: {str(e)}\n{error_trace}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error importing transactions: {str(e)}"
+        )
+
+
+# The rows are returned as already-encoded JSON, so TransactionPage only documents the response
+@router.get("/transactions/user/{user_id}", responses={200: {"model": TransactionPage}})
+@QuotaCost(units=1, per_row=0.01)
+async def get_user_transactions(
+    request: Request,
+    user_id: UUID,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    type: Optional[TransactionType] = None,
+    category: Optional[List[str]] = Query(None),
+    currency: Optional[str] = None,
+    min_amount: Optional[Decimal] = None,
+    max_amount: Optional[Decimal] = None,
+    search: Optional[str] = Query(None, min_length=1),
+    sort: TransactionSort = TransactionSort.DATE_DESC,
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Get a page of transactions for a specific user, optionally filtered and sorted.
+    
+    Args:
+        request (Request): The incoming request, used to report the rows read to the quota
         user_id (UUID): The ID of the user whose transactions to retrieve
-        current_user (UserInDB): The authenticated user (injected by FastAPI)
+        limit (int): Maximum number of transactions in the page
+        cursor (Optional[str]): The next_cursor of the previous page, omitted for the first page
+        start (Optional[datetime]): Only transactions on or after this date
+        end (Optional[datetime]): Only transactions before this date
+        type (Optional[TransactionType]): Only income or only expense transactions
+        category (Optional[List[str]]): Only transactions in any of these categories (repeatable)
+        currency (Optional[str]): Only transactions in this currency
+        min_amount (Optional[Decimal]): Only transactions of at least this amount
+        max_amount (Optional[Decimal]): Only transactions of at most this amount
+        search (Optional[str]): Words to search for in the descriptions
+        sort (TransactionSort): date_desc (default), date_asc, amount_desc or amount_asc
+        current_user (Principal): The authenticated user (injected by FastAPI)
         
     Returns:
-        List[Transaction]: List of transactions
+        TransactionPage: The transactions and the cursor of the next page (null on the last page)
         
     Raises:
+        HTTPException (400): If the cursor or a filter is invalid
         HTTPException (401): If user is not authenticated
         HTTPException (403): If user tries to access another user's transactions
         HTTPException (500): If there's an error fetching the transactions
@@ -70,9 +156,149 @@ async def get_user_transactions(user_id: UUID, current_user: UserInDB = Depends(
         )
         
     try:
-        return await transaction_service.get_user_transactions(user_id)
+        filters = TransactionFilters(
+            start=start,
+            end=end,
+            type=type,
+            categories=category,
+            currency=currency,
+            min_amount=min_amount,
+            max_amount=max_amount,
+            search=search
+        )
+        items, next_cursor = await transaction_service.get_user_transactions(user_id, limit, cursor, filters, sort)
+        record_rows(request, len(items))
+        # Items are already in their JSON shape, so they are encoded directly instead of through TransactionPage
+        return ORJSONResponse({"items": items, "next_cursor": next_cursor})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error fetching transactions: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/transactions/user/{user_id}/summary", response_model=List[SummaryBucket])
+@QuotaCost(units=5)
+async def get_transaction_summary(
+    user_id: UUID,
+    group_by: SummaryGroupBy = SummaryGroupBy.MONTH,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Get income and expense totals of a user grouped by month, ISO week or category.
+    
+    Args:
+        user_id (UUID): The ID of the user whose transactions to summarize
+        group_by (SummaryGroupBy): "month" (default), "week" or "category"
+        start (Optional[datetime]): Only include transactions on or after this date
+        end (Optional[datetime]): Only include transactions before this date
+        current_user (Principal): The authenticated user (injected by FastAPI)
+        
+    Returns:
+        List[SummaryBucket]: Income, expense and transaction count of each group
+        
+    Raises:
+        HTTPException (401): If user is not authenticated
+        HTTPException (403): If user tries to access another user's transactions
+        HTTPException (500): If there's an error computing the summary
+    """
+    if str(user_id) != str(current_user.id):
+        raise HTTPException(
+            status_code=403,
+            detail="Cannot access another user's transactions"
+        )
+
+    try:
+        return await transaction_service.get_summary(user_id, group_by, start, end)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error computing transaction summary: {str(e)}"
+        )
+
+
+@router.get("/transactions/user/{user_id}/export")
+@QuotaCost(units=10, per_kib=0.01)
+async def export_transactions(
+    user_id: UUID,
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    category: Optional[List[str]] = Query(None),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Export a user's transactions, oldest first, as a CSV or Parquet file download.
+    
+    The file is streamed while the transactions are read from the database,
+    so the export never holds the whole history in memory.
+    
+    Args:
+        user_id (UUID): The ID of the user whose transactions to export
+        file_format (ExportFormat): "csv" (default) or "parquet", passed as the format query parameter
+        start (Optional[datetime]): Only export transactions on or after this date
+        end (Optional[datetime]): Only export transactions before this date
+        category (Optional[List[str]]): Only export transactions in any of these categories (repeatable)
+        current_user (Principal): The authenticated user (injected by FastAPI)
+        
+    Returns:
+        StreamingResponse: The exported file
+        
+    Raises:
+        HTTPException (401): If user is not authenticated
+        HTTPException (403): If user tries to export another user's transactions
+    """
+    if str(user_id) != str(current_user.id):
+        raise HTTPException(
+            status_code=403,
+            detail="Cannot access another user's transactions"
+        )
+
+    filters = TransactionFilters(start=start, end=end, categories=category)
+    documents = transaction_service.iter_export_documents(user_id, filters)
+    if file_format == ExportFormat.PARQUET:
+        body, media_type = parquet_chunks(documents), "application/vnd.apache.parquet"
+    else:
+        body, media_type = csv_chunks(documents), "text/csv"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="transactions.{file_format.value}"'}
+    )
+
+
+@router.get("/transactions/user/{user_id}/stream")
+@QuotaCost(units=10, per_kib=0.01)
+async def stream_user_transactions(user_id: UUID, current_user: Principal = Depends(get_current_user)):
+    """
+    Stream the complete transaction history of a user as NDJSON.
+    
+    Each line is one transaction, written as soon as it is read from the
+    database, so the history is never held in memory as a whole.
+    
+    Args:
+        user_id (UUID): The ID of the user whose transactions to retrieve
+        current_user (Principal): The authenticated user (injected by FastAPI)
+        
+    Returns:
+        StreamingResponse: application/x-ndjson body, one transaction per line
+        
+    Raises:
+        HTTPException (401): If user is not authenticated
+        HTTPException (403): If user tries to access another user's transactions
+    """
+    if str(user_id) != str(current_user.id):
+        raise HTTPException(
+            status_code=403,
+            detail="Cannot access another user's transactions"
+        )
+
+    async def ndjson_lines():
+        async for transaction in transaction_service.iter_user_transactions(user_id):
+            yield orjson.dumps(transaction) + b"\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
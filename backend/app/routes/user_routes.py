@@ -1,11 +1,17 @@
 from fastapi import APIRouter, HTTPException, Depends, status
-from app.models.user import UserCreate, UserResponse
+from app.models.user import UserCreate, UserResponse, Principal
 from app.services.user_service import user_service
-from app.core.security import verify_token, oauth2_scheme
+from app.core.security import verify_token, is_token_revoked, oauth2_scheme
 
 router = APIRouter()
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    """
+    Authenticate a request from its bearer token.
+
+    Tokens carrying principal claims (AUTH_CLAIMS_MODE) are trusted without a
+    database lookup; other tokens are checked against the stored user.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -13,13 +19,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     )
     
     token_data = verify_token(token)
-    if token_data is None:
+    if token_data is None or await is_token_revoked(token_data):
         raise credentials_exception
-        
-    user = await user_service.get_user_by_id(token_data.user_id)
+
+    if token_data.has_principal:
+        return Principal(id=token_data.user_id, is_active=token_data.is_active, is_verified=token_data.is_verified)
+    user = await user_service.get_principal(token_data.user_id)
     if user is None:
         raise credentials_exception
-    return user
+    return Principal(id=user.id, is_active=user.is_active, is_verified=user.is_verified)
 
 @router.post("/users/create", response_model=UserResponse)
 async def create_user(user: UserCreate):
@@ -79,9 +87,15 @@ async def get_user_by_email(email: str):
         )
 
 @router.get("/users/me", response_model=UserResponse)
-async def get_current_user_info(current_user: UserResponse = Depends(get_current_user)):
+async def get_current_user_info(current_user: Principal = Depends(get_current_user)):
     """Get current user's information."""
-    return current_user
+    user = await user_service.get_principal(str(current_user.id))
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return user
 
 @router.get("/users/{user_id}", response_model=UserResponse)
 async def get_user(user_id: str):
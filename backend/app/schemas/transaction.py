@@ -0,0 +1,66 @@
+from typing import List, Optional
+from datetime import datetime
+from enum import Enum
+from decimal import Decimal
+from pydantic import BaseModel
+from app.models.transaction import Transaction
+from app.core.money import DEFAULT_CURRENCY
+
+class TransactionPage(BaseModel):
+    items: List[Transaction]
+    next_cursor: Optional[str] = None
+
+class TransactionType(str, Enum):
+    EXPENSE = "expense"
+    INCOME = "income"
+
+class TransactionSort(str, Enum):
+    DATE_DESC = "date_desc"
+    DATE_ASC = "date_asc"
+    AMOUNT_DESC = "amount_desc"
+    AMOUNT_ASC = "amount_asc"
+
+class TransactionFilters(BaseModel):
+    start: Optional[datetime] = None  # inclusive
+    end: Optional[datetime] = None  # exclusive
+    type: Optional[TransactionType] = None
+    categories: Optional[List[str]] = None  # any of
+    currency: Optional[str] = None
+    min_amount: Optional[Decimal] = None  # inclusive, in currency (DEFAULT_CURRENCY if not set)
+    max_amount: Optional[Decimal] = None  # inclusive
+    search: Optional[str] = None  # words of the description
+
+class ImportFormat(str, Enum):
+    CSV = "csv"
+    OFX = "ofx"
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    PARQUET = "parquet"
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportReport(BaseModel):
+    inserted: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+    errors_truncated: bool = False
+
+class SummaryGroupBy(str, Enum):
+    MONTH = "month"
+    WEEK = "week"
+    CATEGORY = "category"
+
+class SummaryBucket(BaseModel):
+    key: str  # "YYYY-MM", ISO week "YYYY-Www" or category name
+    currency: str = DEFAULT_CURRENCY
+    income: Decimal = Decimal(0)
+    expense: Decimal = Decimal(0)
+    count: int = 0
+
+    class Config:
+        json_encoders = {
+            Decimal: float
+        }
@@ -2,7 +2,10 @@ from datetime import datetime, timedelta
 from typing import Optional, Union
 from uuid import UUID
 from fastapi import HTTPException, status, Depends
-from app.core.security import verify_password, get_password_hash, create_tokens, verify_token
+from app.core.security import (
+    verify_password_async, get_password_hash_async, password_needs_update, PasswordHashPoolFull,
+    create_tokens, verify_token, revoke_token, is_token_revoked
+)
 from app.models.user import UserCreate, UserInDB, OAuthInfo, UserExistResponse
 from app.services.user_service import user_service
 from motor.motor_asyncio import AsyncIOMotorDatabase
@@ -10,14 +13,11 @@ from app.core.database import db, get_database
 import logging
 from pydantic import BaseModel
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class AuthService:
     def __init__(self, database: AsyncIOMotorDatabase):
         self.db = database
-        self._token_blacklist = set()  # In-memory token blacklist. Consider using Redis in production
         
     async def register(self, user: UserCreate) -> Union[UserExistResponse, UserInDB]:
         """
@@ -57,7 +57,7 @@ class AuthService:
                         status_code=status.HTTP_400_BAD_REQUEST,
                         detail="Password must be at least 8 characters long"
                     )
-                hashed_password = get_password_hash(user.password)
+                hashed_password = await get_password_hash_async(user.password)
                 del user_dict["password"]
                 user_dict["hashed_password"] = hashed_password
             elif not user.oauth_info:
@@ -84,14 +84,27 @@ class AuthService:
     async def login(self, email: str, password: str) -> dict:
         """Authenticate user and return tokens."""
         user = await user_service.get_user_by_email(email)
-        if not user or not verify_password(password, user.hashed_password):
+        if not user or not user.hashed_password or not await verify_password_async(password, user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+
+        if password_needs_update(user.hashed_password):
+            await self._rehash_password(user, password)
             
-        return create_tokens(str(user.id))
+        return create_tokens(str(user.id), user)
+
+    async def _rehash_password(self, user: UserInDB, password: str):
+        """Rehash a verified password with the configured Argon2 parameters. Never fails the login."""
+        try:
+            new_hash = await get_password_hash_async(password)
+        except PasswordHashPoolFull:
+            # Try again on a later login rather than add to the load
+            return
+        if await user_service.update_password_hash(str(user.id), user.hashed_password, new_hash):
+            logger.info(f"Rehashed password of user {user.id} with the current parameters")
     
     async def oauth_login(self, oauth_info: OAuthInfo, user_data: UserCreate) -> dict:
         """Handle OAuth login/signup flow."""
@@ -102,7 +115,7 @@ class AuthService:
         )
         
         if existing_user:
-            return create_tokens(str(existing_user.id))
+            return create_tokens(str(existing_user.id), existing_user)
             
         # If not found by OAuth, check if user exists by email
         existing_user = await user_service.get_user_by_email(user_data.email)
@@ -118,7 +131,7 @@ class AuthService:
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Failed to update user with OAuth info"
                 )
-            return create_tokens(str(updated_user.id))
+            return create_tokens(str(updated_user.id), updated_user)
             
         # Create new user with OAuth info if no existing user found
         user_data.oauth_info = oauth_info
@@ -126,8 +139,8 @@ class AuthService:
         return create_tokens(str(new_user.id))
     
     async def logout(self, token: str) -> bool:
-        """Logout user by blacklisting their token."""
-        self._token_blacklist.add(token)
+        """Logout user by revoking their token."""
+        await revoke_token(token)
         return True
         
     async def refresh_token(self, refresh_token: str) -> dict:
@@ -142,7 +155,7 @@ class AuthService:
             )
             
         # Check if token is blacklisted
-        if refresh_token in self._token_blacklist:
+        if await is_token_revoked(token_data):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token has been revoked",
@@ -157,8 +170,8 @@ class AuthService:
                 headers={"WWW-Authenticate": "Bearer"},
             )
             
-        # Create new tokens
-        return create_tokens(str(user.id))
+        # Create new tokens, with the user's current claims
+        return create_tokens(str(user.id), user)
 
     async def send_verification_email(self, user_id: UUID) -> bool:
         """Send email verification link."""
@@ -219,11 +232,12 @@ class AuthService:
             )
             
         # Update password
-        hashed_password = get_password_hash(new_password)
+        hashed_password = await get_password_hash_async(new_password)
         await self.db["users"].update_one(
             {"_id": user.id},
             {"$set": {"hashed_password": hashed_password}}
         )
+        user_service.invalidate_user(user.id)
         
         return True
 
@@ -1,11 +1,14 @@
 from typing import List
 from app.schemas.category import CategoryCreate, CategoryResponse
 from app.core.database import db
+from app.core.singleflight import SingleFlight
 from fastapi import HTTPException
 
 class CategoryService:
     def __init__(self):
         self.db = db
+        # Concurrent identical lookups (e.g. a dashboard's parallel requests) share one query
+        self.lookups = SingleFlight(name="categories")
     
     @property
     def collection(self):
@@ -17,6 +20,9 @@ class CategoryService:
         if self.db is None or self.db.db is None:
             raise Exception("Database not initialized")
             
+        return await self.lookups.do("defaults", self._load_default_categories)
+
+    async def _load_default_categories(self) -> List[CategoryResponse]:
         cursor = self.db.db.defaultCategories.find({})
         categories = []
         async for category in cursor:
@@ -33,8 +39,11 @@ class CategoryService:
         if self.collection is None:
             raise Exception("Database not initialized")
             
-        user = await self.collection.find_one({"id": user_id})
-        if not user:
+        user = await self.lookups.do(
+            ("custom", user_id),
+            lambda: self.collection.find_one({"id": user_id}, {"_id": 0, "customCategories": 1})
+        )
+        if user is None:
             raise HTTPException(status_code=404, detail="User not found")
         
         return [CategoryResponse(
@@ -61,6 +70,8 @@ class CategoryService:
             {"id": user_id},
             {"$push": {"customCategories": new_category}}
         )
+        # A lookup in flight may have read the categories before the write
+        self.lookups.forget(("custom", user_id))
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="User not found")
@@ -75,6 +86,7 @@ class CategoryService:
             {"id": user_id},
             {"$pull": {"customCategories": {"name": category_name}}}
         )
+        self.lookups.forget(("custom", user_id))
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Category not found or user not found")
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+from typing import Callable, Optional
+from pymongo import ASCENDING, UpdateOne
+from app.core.database import db
+from app.core.money import DEFAULT_CURRENCY, minor_unit_exponent, to_minor_units
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_DATE_FIELDS = ["date", "created_at", "updated_at"]
+TRANSACTION_DATES_MIGRATION = "transaction_dates"
+TRANSACTION_AMOUNTS_MIGRATION = "transaction_amounts"
+
+
+class MigrationService:
+    """
+    Online data migrations.
+
+    Each migration records its progress in the migrations collection after every
+    batch, so it can be stopped at any time and resumed where it left off.
+    """
+    def __init__(self):
+        self.db = db
+
+    @property
+    def collection(self):
+        return self.db.db.migrations if hasattr(self.db, 'db') and self.db.db is not None else None
+
+    async def get_progress(self, name: str) -> Optional[dict]:
+        """Get the recorded progress of a migration, or None if it never ran."""
+        if self.collection is None:
+            raise Exception("Database not initialized")
+        return await self.collection.find_one({"_id": name})
+
+    async def _run(
+        self,
+        name: str,
+        query: dict,
+        projection: dict,
+        convert: Callable[[dict], UpdateOne],
+        batch_size: int,
+        pause_seconds: float
+    ) -> dict:
+        """
+        Rewrite the transactions matching query in batches.
+
+        Transactions are read in _id order, starting after the last one handled by
+        a previous run, and rewritten with one bulk_write per batch, sleeping
+        pause_seconds between batches to limit the load on the database while the
+        application keeps serving. convert returns the update of a document, or
+        raises ValueError to leave it unchanged and count it as failed. Running a
+        migration again after completion picks up documents written since by
+        older versions of the application.
+        """
+        if self.collection is None:
+            raise Exception("Database not initialized")
+        transactions = self.db.db.transactions
+
+        progress = await self.get_progress(name) or {
+            "_id": name, "last_id": None, "converted": 0, "failed": 0, "done": False
+        }
+        remaining = await transactions.count_documents(query)
+        logger.info(f"Running migration {name}: {remaining} documents left")
+        processed = 0
+
+        while True:
+            batch_query = dict(query)
+            if progress["last_id"] is not None:
+                batch_query["_id"] = {"$gt": progress["last_id"]}
+            batch = await transactions.find(batch_query, projection).sort("_id", ASCENDING).limit(batch_size).to_list(length=batch_size)
+            if not batch:
+                break
+
+            updates = []
+            for document in batch:
+                try:
+                    updates.append(convert(document))
+                except ValueError as e:
+                    logger.error(f"Migration {name} cannot convert transaction {document['_id']}: {e}")
+                    progress["failed"] += 1
+
+            if updates:
+                result = await transactions.bulk_write(updates, ordered=False)
+                progress["converted"] += result.modified_count
+            processed += len(batch)
+            progress["last_id"] = batch[-1]["_id"]
+            progress["updated_at"] = datetime.now(timezone.utc)
+            await self.collection.replace_one({"_id": name}, progress, upsert=True)
+
+            logger.info(
+                f"Migration {name}: {processed}/{remaining} processed, "
+                f"{progress['converted']} converted, {progress['failed']} failed"
+            )
+            await asyncio.sleep(pause_seconds)
+
+        progress["done"] = True
+        progress["updated_at"] = datetime.now(timezone.utc)
+        await self.collection.replace_one({"_id": name}, progress, upsert=True)
+        logger.info(f"Migration {name} completed: {progress['converted']} converted, {progress['failed']} failed")
+        return progress
+
+    async def migrate_transaction_dates(self, batch_size: int = 500, pause_seconds: float = 0.1) -> dict:
+        """
+        Convert the ISO string dates of stored transactions to native BSON datetimes.
+
+        Returns:
+            dict: The final progress (last_id, converted, failed, done)
+        """
+        def convert(document: dict) -> UpdateOne:
+            converted = {
+                field: datetime.fromisoformat(document[field])
+                for field in TRANSACTION_DATE_FIELDS
+                if isinstance(document.get(field), str)
+            }
+            # Only rewrite values still equal to what was read, so concurrent updates win
+            return UpdateOne(
+                {"_id": document["_id"], **{field: document[field] for field in converted}},
+                {"$set": converted}
+            )
+
+        return await self._run(
+            TRANSACTION_DATES_MIGRATION,
+            {"$or": [{field: {"$type": "string"}} for field in TRANSACTION_DATE_FIELDS]},
+            {field: 1 for field in TRANSACTION_DATE_FIELDS},
+            convert,
+            batch_size,
+            pause_seconds
+        )
+
+    async def migrate_transaction_amounts(self, batch_size: int = 500, pause_seconds: float = 0.1) -> dict:
+        """
+        Convert the float amounts of stored transactions to integer minor units (amount_minor).
+
+        Transactions without a currency get DEFAULT_CURRENCY. Amounts are rounded
+        half-even to the currency's minor unit.
+
+        Returns:
+            dict: The final progress (last_id, converted, failed, done)
+        """
+        def convert(document: dict) -> UpdateOne:
+            currency = document.get("currency") or DEFAULT_CURRENCY
+            try:
+                amount = Decimal(str(document["amount"])).quantize(
+                    Decimal(1).scaleb(-minor_unit_exponent(currency)), rounding=ROUND_HALF_EVEN
+                )
+            except InvalidOperation:
+                raise ValueError(f"Invalid amount: {document['amount']}")
+            return UpdateOne(
+                {"_id": document["_id"], "amount": document["amount"]},
+                {
+                    "$set": {"amount_minor": to_minor_units(amount, currency), "currency": currency},
+                    "$unset": {"amount": ""}
+                }
+            )
+
+        return await self._run(
+            TRANSACTION_AMOUNTS_MIGRATION,
+            {"amount_minor": {"$exists": False}, "amount": {"$exists": True}},
+            {"amount": 1, "currency": 1},
+            convert,
+            batch_size,
+            pause_seconds
+        )
+
+# Create a global instance
+migration_service = MigrationService()
@@ -0,0 +1,264 @@
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+from uuid import UUID
+from pymongo import ASCENDING, IndexModel, UpdateOne
+from app.core.database import db
+from app.core.money import DEFAULT_CURRENCY, from_minor_units
+from app.schemas.transaction import SummaryBucket, SummaryGroupBy
+
+logger = logging.getLogger(__name__)
+
+REBUILD_BATCH_SIZE = 1000
+# Entry in the migrations collection recording that a full rebuild() has completed
+BUILT_MARKER = "transaction_rollups"
+# Seconds between checks for that entry while it is missing; rebuilds run in another process
+BUILT_RECHECK_SECONDS = 60
+
+
+def rollup_month(value) -> str:
+    """The UTC month ("YYYY-MM") of a stored transaction date."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y-%m")
+
+
+def _rollup_key():
+    return {
+        "user_id": "$user_id",
+        "month": {"$dateToString": {"format": "%Y-%m", "date": {"$toDate": "$date"}}},
+        "type": "$type",
+        "currency": {"$ifNull": ["$currency", DEFAULT_CURRENCY]}
+    }
+
+
+class RollupService:
+    """
+    Pre-aggregated monthly totals of each user's transactions.
+
+    transaction_rollups holds one document per (user_id, month, type, category,
+    currency) with the total amount in integer minor units (total_minor) and
+    the number of transactions. The document with category null holds the
+    month's totals over all transactions, so that transactions with several
+    categories (or none) are counted once.
+
+    Writes to transactions call add/remove to keep the rollups current with
+    $inc upserts. Rollups are not updated in the same transaction as the
+    write, so a failure in between leaves them off until rebuild() runs.
+    Transactions stored before the rollups existed are only covered once a full
+    rebuild() has run, which records it in the migrations collection; summaries
+    are aggregated from the transactions until then (see is_built).
+    """
+    INDEXES = [
+        IndexModel(
+            [
+                ("user_id", ASCENDING), ("month", ASCENDING), ("type", ASCENDING),
+                ("category", ASCENDING), ("currency", ASCENDING)
+            ],
+            name="user_id_month_type_category_currency",
+            unique=True
+        ),
+    ]
+    # Replaced indexes, dropped by ensure_indexes
+    LEGACY_INDEXES = ["user_id_month_type_category"]
+
+    def __init__(self):
+        self.db = db
+        self._built = False
+        self._built_checked_at: Optional[float] = None
+
+    @property
+    def collection(self):
+        return self.db.db.transaction_rollups if hasattr(self.db, 'db') and self.db.db is not None else None
+
+    @property
+    def analytics_collection(self):
+        """The collection for summary reads, which may be served by secondaries."""
+        database = self.db.analytics_db if self.db.analytics_db is not None else self.db.db
+        return database.transaction_rollups if database is not None else None
+
+    async def ensure_indexes(self):
+        """Create the indexes in INDEXES. Safe to call on every startup."""
+        if self.collection is None:
+            raise Exception("Database not initialized")
+        existing = await self.collection.index_information()
+        for name in self.LEGACY_INDEXES:
+            if name in existing:
+                await self.collection.drop_index(name)
+        await self.collection.create_indexes(self.INDEXES)
+
+    async def _apply(self, documents: Iterable[dict], sign: int):
+        increments = defaultdict(lambda: [0, 0])
+        for document in documents:
+            month = rollup_month(document["date"])
+            currency = document.get("currency", DEFAULT_CURRENCY)
+            for category in [None] + list(dict.fromkeys(document["categories"])):
+                increment = increments[(document["user_id"], month, document["type"], category, currency)]
+                increment[0] += sign * document["amount_minor"]
+                increment[1] += sign
+
+        if not increments:
+            return
+        await self.collection.bulk_write([
+            UpdateOne(
+                {"user_id": user_id, "month": month, "type": type_, "category": category, "currency": currency},
+                {"$inc": {"total_minor": total, "count": count}},
+                upsert=True
+            )
+            for (user_id, month, type_, category, currency), (total, count) in increments.items()
+        ], ordered=False)
+
+    async def add(self, documents: Iterable[dict]):
+        """Add stored transaction documents to the rollups."""
+        if self.collection is None:
+            raise Exception("Database not initialized")
+        await self._apply(documents, 1)
+
+    async def add_inserted(self, documents: Iterable[dict]):
+        """
+        Add just inserted transaction documents to the rollups, logging errors instead of raising them.
+
+        The transactions are stored either way, and failing their request would make
+        clients retry and insert them twice; the rollups stay off until rebuild() runs.
+        """
+        try:
+            await self.add(documents)
+        except Exception as e:
+            logger.error(f"Error adding inserted transactions to the rollups, run rebuild_rollups.py to repair them: {e}")
+
+    async def remove(self, documents: Iterable[dict]):
+        """Subtract stored transaction documents (as they were before an update or delete) from the rollups."""
+        if self.collection is None:
+            raise Exception("Database not initialized")
+        await self._apply(documents, -1)
+
+    async def get_summary(
+        self,
+        user_id: UUID,
+        group_by: SummaryGroupBy,
+        start_month: Optional[str] = None,
+        end_month: Optional[str] = None
+    ) -> List[SummaryBucket]:
+        """
+        Get a user's income and expense totals per month or per category from the rollups.
+
+        Args:
+            user_id (UUID): The ID of the user
+            group_by (SummaryGroupBy): MONTH or CATEGORY
+            start_month (Optional[str]): First month ("YYYY-MM") to include
+            end_month (Optional[str]): First month ("YYYY-MM") not to include
+
+        Returns:
+            List[SummaryBucket]: The totals of each group, sorted by key
+        """
+        if self.collection is None:
+            raise Exception("Database not initialized")
+        if group_by not in (SummaryGroupBy.MONTH, SummaryGroupBy.CATEGORY):
+            raise ValueError(f"Rollups cannot be grouped by {group_by.value}")
+
+        query = {
+            "user_id": str(user_id),
+            # Month totals come from the null category, category totals from the others
+            "category": None if group_by == SummaryGroupBy.MONTH else {"$ne": None}
+        }
+        if start_month or end_month:
+            query["month"] = {}
+            if start_month:
+                query["month"]["$gte"] = start_month
+            if end_month:
+                query["month"]["$lt"] = end_month
+
+        totals = {}
+        async for rollup in self.analytics_collection.find(query):
+            key = rollup["month"] if group_by == SummaryGroupBy.MONTH else rollup["category"]
+            total = totals.setdefault((key, rollup["currency"]), {"income": 0, "expense": 0, "count": 0})
+            total[rollup["type"]] += rollup["total_minor"]
+            total["count"] += rollup["count"]
+        return [
+            SummaryBucket(
+                key=key,
+                currency=currency,
+                income=from_minor_units(total["income"], currency),
+                expense=from_minor_units(total["expense"], currency),
+                count=total["count"]
+            )
+            for (key, currency), total in sorted(totals.items())
+            if total["count"]
+        ]
+
+    async def is_built(self) -> bool:
+        """
+        Whether a full rebuild() has completed, i.e. the rollups cover every stored transaction.
+
+        Looked up at most once per BUILT_RECHECK_SECONDS while it has not, and never again once it has.
+        """
+        if self._built:
+            return True
+        now = time.monotonic()
+        if self._built_checked_at is not None and now - self._built_checked_at < BUILT_RECHECK_SECONDS:
+            return False
+        self._built_checked_at = now
+        marker = await self.db.db.migrations.find_one({"_id": BUILT_MARKER})
+        self._built = bool(marker and marker.get("done"))
+        return self._built
+
+    async def mark_built(self):
+        """Record that the rollups cover every stored transaction, so that summaries read them."""
+        await self.db.db.migrations.replace_one(
+            {"_id": BUILT_MARKER},
+            {"_id": BUILT_MARKER, "done": True, "updated_at": datetime.now(timezone.utc)},
+            upsert=True
+        )
+        self._built = True
+
+    async def rebuild(self, user_id: Optional[UUID] = None):
+        """
+        Recompute the rollups from the transactions, for one user or for everyone.
+
+        Writes made while the rebuild runs may be lost from the rollups, so run it
+        when the affected users are inactive.
+        """
+        if self.collection is None:
+            raise Exception("Database not initialized")
+
+        match = {"user_id": str(user_id)} if user_id else {}
+        await self.collection.delete_many(match)
+
+        group_by_category = [
+            {"$match": match},
+            # Count a category listed twice on a transaction once, as add() does
+            {"$set": {"categories": {"$setUnion": ["$categories", []]}}},
+            {"$unwind": "$categories"},
+            {"$group": {
+                "_id": {**_rollup_key(), "category": "$categories"},
+                "total_minor": {"$sum": "$amount_minor"},
+                "count": {"$sum": 1}
+            }},
+        ]
+        group_by_month = [
+            {"$match": match},
+            {"$group": {
+                "_id": _rollup_key(),
+                "total_minor": {"$sum": "$amount_minor"},
+                "count": {"$sum": 1}
+            }},
+        ]
+        for pipeline in (group_by_category, group_by_month):
+            batch = []
+            async for rollup in self.db.db.transactions.aggregate(pipeline):
+                key = {"category": None, **rollup["_id"]}
+                batch.append(UpdateOne(key, {"$set": {"total_minor": rollup["total_minor"], "count": rollup["count"]}}, upsert=True))
+                if len(batch) >= REBUILD_BATCH_SIZE:
+                    await self.collection.bulk_write(batch, ordered=False)
+                    batch = []
+            if batch:
+                await self.collection.bulk_write(batch, ordered=False)
+        if user_id is None:
+            await self.mark_built()
+
+# Create a global instance
+rollup_service = RollupService()
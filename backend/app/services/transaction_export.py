@@ -0,0 +1,105 @@
+import csv
+import io
+from typing import AsyncIterator
+from app.core.money import DEFAULT_CURRENCY, from_minor_units
+
+CSV_COLUMNS = ["date", "type", "amount", "currency", "categories", "description"]
+# Separator of the categories column, the same one the CSV import expects
+CSV_CATEGORY_SEPARATOR = ";"
+# Rows buffered before a chunk of the CSV is sent
+CSV_CHUNK_ROWS = 500
+# Rows per Parquet row group; one row group is held in memory at a time
+PARQUET_ROW_GROUP_SIZE = 10000
+
+
+async def csv_chunks(documents: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """Encode stored transaction documents as CSV, yielding a chunk every CSV_CHUNK_ROWS rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    rows = 0
+    async for document in documents:
+        currency = document.get("currency", DEFAULT_CURRENCY)
+        writer.writerow([
+            document["date"].isoformat(),
+            document["type"],
+            # Formatted from the integer minor units, so the exported amount is exact
+            str(from_minor_units(document["amount_minor"], currency)),
+            currency,
+            CSV_CATEGORY_SEPARATOR.join(document.get("categories", [])),
+            document.get("description") or ""
+        ])
+        rows += 1
+        if rows % CSV_CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file that hands out what was written so far while reporting the full file position."""
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def parquet_chunks(documents: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """
+    Encode stored transaction documents as Parquet, yielding each row group as soon as it is written.
+
+    Amounts are written as integer minor units (amount_minor) next to their currency.
+    """
+    # Only exports need pyarrow, so it is not loaded with the rest of the app
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("date", pa.timestamp("ms", tz="UTC")),
+        ("type", pa.string()),
+        ("amount_minor", pa.int64()),
+        ("currency", pa.string()),
+        ("categories", pa.list_(pa.string())),
+        ("description", pa.string()),
+    ])
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    columns = {name: [] for name in schema.names}
+
+    def write_row_group():
+        writer.write_table(pa.table(columns, schema=schema))
+        for values in columns.values():
+            values.clear()
+
+    async for document in documents:
+        columns["date"].append(document["date"])
+        columns["type"].append(document["type"])
+        columns["amount_minor"].append(document["amount_minor"])
+        columns["currency"].append(document.get("currency", DEFAULT_CURRENCY))
+        columns["categories"].append(document.get("categories", []))
+        columns["description"].append(document.get("description"))
+        if len(columns["date"]) >= PARQUET_ROW_GROUP_SIZE:
+            write_row_group()
+            yield sink.drain()
+
+    if columns["date"]:
+        write_row_group()
+    writer.close()
+    yield sink.drain()
@@ -0,0 +1,177 @@
+import codecs
+import csv
+import re
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from typing import AsyncIterator, Dict, Optional, Tuple, Union
+
+
+class RowError(ValueError):
+    """A row the parser could not read; it is reported for that row and the import goes on."""
+
+
+# A parsed row: its 1-based position in the file and the raw transaction fields, or why they could not be read
+ParsedRow = Tuple[int, Union[Dict, RowError]]
+
+CSV_CATEGORY_SEPARATOR = ";"
+# Upper bound on a single CSV record or OFX transaction, so a malformed file cannot grow the buffers
+MAX_RECORD_SIZE = 64 * 1024
+
+# A statement's currency or one of its transactions, in the order they appear
+_OFX_TOKEN = re.compile(r"<CURDEF>\s*(\w{3})|<STMTTRN>(.*?)</STMTTRN>", re.IGNORECASE | re.DOTALL)
+_OFX_OPENING_TAGS = ("<CURDEF>", "<STMTTRN>")
+_OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+_OFX_DATE = re.compile(r"^(\d{8})(\d{6})?(?:\.\d+)?(?:\[([+-]?\d+(?:\.\d+)?)(?::\w+)?\])?")
+
+
+async def iter_text(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream to text chunks, handling characters split across chunks and a UTF-8 BOM."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    async for chunk in stream:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Yield complete lines (without line endings) from a byte stream."""
+    pending = ""
+    async for text in iter_text(stream):
+        pending += text
+        lines = pending.splitlines(keepends=True)
+        # The last piece may be an incomplete line; keep it for the next chunk
+        pending = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        if len(pending) > MAX_RECORD_SIZE:
+            raise ValueError("Line is too large")
+        for line in lines:
+            yield line.rstrip("\r\n")
+    if pending:
+        yield pending
+
+
+def _signed_amount_fields(fields: Dict, amount: Optional[str]) -> None:
+    """
+    Set amount, and type when missing, from a possibly signed amount (negative means expense).
+
+    Raises RowError if the amount is not a number, since the type may depend on it.
+    """
+    if amount is None:
+        return
+    amount = amount.strip()
+    try:
+        value = Decimal(amount)
+    except InvalidOperation:
+        raise RowError(f"amount: {amount!r} is not a valid number")
+    if not fields.get("type"):
+        fields["type"] = "expense" if value < 0 else "income"
+    fields["amount"] = abs(value)
+
+
+async def parse_csv(stream: AsyncIterator[bytes]) -> AsyncIterator[ParsedRow]:
+    """
+    Parse a CSV export incrementally.
+
+    The first line is a header naming the columns date, amount and optionally
+    type, currency, categories (separated by ';') and description. Without a
+    type column, negative amounts are expenses and positive amounts income.
+    """
+    header = None
+    record = ""
+    row_number = 0
+    async for line in iter_lines(stream):
+        # A quoted field may contain line breaks; keep joining lines until quotes are balanced
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            if len(record) > MAX_RECORD_SIZE:
+                raise ValueError(f"CSV record after row {row_number} is too large or has an unclosed quote")
+            continue
+        values, record = next(csv.reader([record])), ""
+
+        if header is None:
+            header = [column.strip().lower() for column in values]
+            continue
+        if not any(value.strip() for value in values):
+            continue
+
+        row_number += 1
+        raw = dict(zip(header, values))
+        fields = {
+            "type": (raw.get("type") or "").strip(),
+            "date": (raw.get("date") or "").strip(),
+            "categories": [
+                category.strip()
+                for category in (raw.get("categories") or "").split(CSV_CATEGORY_SEPARATOR)
+                if category.strip()
+            ],
+            "description": (raw.get("description") or "").strip() or None,
+        }
+        if (raw.get("currency") or "").strip():
+            fields["currency"] = raw["currency"].strip()
+        try:
+            _signed_amount_fields(fields, raw.get("amount"))
+        except RowError as e:
+            yield row_number, e
+            continue
+        yield row_number, fields
+
+
+def parse_ofx_date(value: str) -> str:
+    """Convert an OFX date (YYYYMMDD[HHMMSS[.XXX]][[offset:TZ]]) to ISO format."""
+    match = _OFX_DATE.match(value.strip())
+    if not match:
+        return value
+    day, time, offset = match.groups()
+    try:
+        parsed = datetime.strptime(day + (time or "000000"), "%Y%m%d%H%M%S")
+    except ValueError:
+        return value
+    tz = timezone(timedelta(hours=float(offset))) if offset else timezone.utc
+    return parsed.replace(tzinfo=tz).isoformat()
+
+
+async def parse_ofx(stream: AsyncIterator[bytes]) -> AsyncIterator[ParsedRow]:
+    """
+    Parse the STMTTRN records of an OFX (SGML or XML) statement incrementally.
+
+    The transaction type follows the sign of TRNAMT, NAME and MEMO form the description
+    and the currency is the CURDEF of the statement the transaction belongs to.
+    """
+    pending = ""
+    row_number = 0
+    currency = None
+    async for text in iter_text(stream):
+        pending += text
+        end = 0
+        for match in _OFX_TOKEN.finditer(pending):
+            end = match.end()
+            if match.group(1):
+                # CURDEF precedes the transaction list of its statement; a file may hold several
+                currency = match.group(1).upper()
+                continue
+            row_number += 1
+            raw = {tag.upper(): value.strip() for tag, value in _OFX_FIELD.findall(match.group(2))}
+            description = " - ".join(part for part in (raw.get("NAME"), raw.get("MEMO")) if part)
+            fields = {
+                "date": parse_ofx_date(raw.get("DTPOSTED", "")),
+                "categories": [],
+                "description": description or None,
+            }
+            if currency:
+                fields["currency"] = currency
+            try:
+                _signed_amount_fields(fields, raw.get("TRNAMT"))
+            except RowError as e:
+                yield row_number, e
+                continue
+            yield row_number, fields
+        # Keep the unfinished record or CURDEF (tag and value may be split across chunks),
+        # or else the last few characters in case an opening tag is split
+        pending = pending[end:]
+        upper = pending.upper()
+        starts = [start for start in (upper.find(tag) for tag in _OFX_OPENING_TAGS) if start != -1]
+        pending = pending[min(starts):] if starts else pending[-max(map(len, _OFX_OPENING_TAGS)):]
+        if len(pending) > MAX_RECORD_SIZE:
+            raise ValueError(f"OFX transaction after row {row_number} is too large or not closed")
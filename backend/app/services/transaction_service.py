@@ -1,54 +1,501 @@
-from datetime import datetime
+from datetime import datetime, timezone
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+from typing import AsyncIterator, List, Optional, Tuple, Union
 from uuid import UUID
+from bson import ObjectId
+from bson.errors import InvalidId
+from pydantic import ValidationError
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import BulkWriteError, WriteError
 from app.models.transaction import Transaction
+from app.schemas.transaction import (
+    ImportReport, ImportRowError, SummaryBucket, SummaryGroupBy, TransactionFilters, TransactionSort
+)
+from app.services.transaction_import import ParsedRow, RowError
+from app.services.rollup_service import rollup_service, rollup_month
+from app.core.batching import WriteBatcher
 from app.core.database import db
+from app.core.money import DEFAULT_CURRENCY, from_minor_units, minor_unit_exponent, to_minor_units
+import base64
+import json
+import os
+
+# Transactions are listed newest first; _id breaks ties between equal dates
+HISTORY_SORT = [("date", DESCENDING), ("_id", DESCENDING)]
+# Sort orders of listed transactions, each ending with _id to make it unique for keyset pagination
+SORTS = {
+    TransactionSort.DATE_DESC: HISTORY_SORT,
+    TransactionSort.DATE_ASC: [("date", ASCENDING), ("_id", ASCENDING)],
+    TransactionSort.AMOUNT_DESC: [("amount_minor", DESCENDING), ("_id", DESCENDING)],
+    TransactionSort.AMOUNT_ASC: [("amount_minor", ASCENDING), ("_id", ASCENDING)],
+}
+# Fields of the documents read for the API; anything else stored on a transaction is not transferred
+READ_PROJECTION = {
+    "user_id": 1, "type": 1, "categories": 1, "amount": 1, "amount_minor": 1, "currency": 1,
+    "date": 1, "description": 1, "created_at": 1, "updated_at": 1
+}
+# Exports are chronological, which walks the history index backwards
+EXPORT_SORT = [("date", ASCENDING), ("_id", ASCENDING)]
+EXPORT_PROJECTION = {
+    "_id": 0, "date": 1, "type": 1, "amount": 1, "amount_minor": 1, "currency": 1, "categories": 1, "description": 1
+}
+# Documents fetched per round trip by exports, which bounds their memory use
+EXPORT_BATCH_SIZE = 1000
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+# Imported rows are validated and inserted this many at a time
+IMPORT_BATCH_SIZE = 500
+# Only the first errors are listed in an import report; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+# Coalesce concurrent create_transaction inserts into insert_many batches (off by default)
+TRANSACTION_WRITE_BATCHING = os.getenv("TRANSACTION_WRITE_BATCHING", "false").lower() in ("1", "true", "yes")
+# A batch is written this long after its first insert, or as soon as it holds TRANSACTION_BATCH_MAX_DOCS
+TRANSACTION_BATCH_WINDOW_MS = float(os.getenv("TRANSACTION_BATCH_WINDOW_MS", "2"))
+TRANSACTION_BATCH_MAX_DOCS = int(os.getenv("TRANSACTION_BATCH_MAX_DOCS", "500"))
+
+
+def encode_cursor(transaction: dict, sort: TransactionSort = TransactionSort.DATE_DESC) -> str:
+    """Build an opaque continuation token from the last document of a page."""
+    field = SORTS[sort][0][0]
+    value = transaction.get(field)
+    payload = {"o": sort.value, "i": str(transaction["_id"])}
+    if isinstance(value, datetime):
+        payload["d"] = value.isoformat()
+    else:
+        # Numbers, or dates not yet converted by migrate_transaction_dates (ISO strings)
+        payload["v"] = value
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: TransactionSort = TransactionSort.DATE_DESC) -> Tuple[Union[datetime, str, int], ObjectId]:
+    """Decode a continuation token. Raises ValueError if it is malformed or was issued for another sort order."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["o"] != sort.value:
+            raise ValueError
+        value = datetime.fromisoformat(payload["d"]) if "d" in payload else payload["v"]
+        return value, ObjectId(payload["i"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise ValueError("Invalid pagination cursor")
+
+
+def keyset_condition(cursor: str, sort: TransactionSort) -> dict:
+    """Query condition selecting the documents after the cursor in the given sort order."""
+    last_value, last_id = decode_cursor(cursor, sort)
+    (field, direction), _ = SORTS[sort]
+    operator = "$lt" if direction == DESCENDING else "$gt"
+    condition = [
+        {field: {operator: last_value}},
+        {field: last_value, "_id": {operator: last_id}}
+    ]
+    # Unmigrated string dates sort before every datetime, i.e. after them in descending order
+    if field == "date" and direction == DESCENDING and isinstance(last_value, datetime):
+        condition.append({"date": {"$type": "string"}})
+    elif field == "date" and direction == ASCENDING and isinstance(last_value, str):
+        condition.append({"date": {"$type": "date"}})
+    return {"$or": condition}
+
+
+def to_document(transaction: Transaction) -> dict:
+    """Convert a validated transaction to the document stored in MongoDB."""
+    transaction_dict = transaction.model_dump()
+
+    # Convert UUID to string for MongoDB storage
+    transaction_dict["user_id"] = str(transaction_dict["user_id"])
+    
+    # Store type as string
+    if transaction_dict["type"] not in ["income", "expense"]:
+        raise ValueError("Transaction type must be either 'income' or 'expense'")
+    
+    # Dates are stored as native BSON datetimes so range queries and sorting compare instants
+
+    # Amounts are stored as exact integer minor units (cents for USD)
+    transaction_dict["amount_minor"] = to_minor_units(transaction_dict.pop("amount"), transaction_dict["currency"])
+    return transaction_dict
+
+
+def normalize_document(transaction_dict: dict) -> dict:
+    """Bring a stored document written before the date and amount migrations to the current format."""
+    currency = transaction_dict.setdefault("currency", DEFAULT_CURRENCY)
+    for field in ("date", "created_at", "updated_at"):
+        if isinstance(transaction_dict.get(field), str):
+            transaction_dict[field] = datetime.fromisoformat(transaction_dict[field])
+    if "amount_minor" not in transaction_dict:
+        minor_unit = Decimal(1).scaleb(-minor_unit_exponent(currency))
+        amount = Decimal(str(transaction_dict.pop("amount"))).quantize(minor_unit)
+        transaction_dict["amount_minor"] = to_minor_units(amount, currency)
+    return transaction_dict
+
+
+def from_document(transaction_dict: dict) -> Transaction:
+    """Convert a stored MongoDB document to a transaction."""
+    transaction_dict.pop("_id", None)
+    normalize_document(transaction_dict)
+    transaction_dict["amount"] = from_minor_units(transaction_dict.pop("amount_minor"), transaction_dict["currency"])
+    return Transaction(**transaction_dict)
+
+
+def to_api_row(transaction_dict: dict) -> dict:
+    """
+    Convert a stored document straight to the JSON-ready dict the API returns for a transaction.
+
+    Stored documents were validated when they were written, so this skips building
+    a Transaction and produces the same output as its JSON serialization.
+    """
+    normalize_document(transaction_dict)
+    currency = transaction_dict["currency"]
+    minor_unit = 10 ** minor_unit_exponent(currency)
+    return {
+        "user_id": transaction_dict["user_id"],
+        "type": transaction_dict["type"],
+        "categories": transaction_dict["categories"],
+        "amount": transaction_dict["amount_minor"] / minor_unit,
+        "currency": currency,
+        # Transaction serializes every datetime as a plain date; date().isoformat() is that, several times faster than strftime
+        "date": transaction_dict["date"].date().isoformat(),
+        "description": transaction_dict.get("description"),
+        "created_at": transaction_dict["created_at"].date().isoformat(),
+        "updated_at": transaction_dict["updated_at"].date().isoformat(),
+    }
+
+
+def transaction_query(user_id: UUID, filters: Optional[TransactionFilters] = None) -> dict:
+    """Build the query selecting a user's transactions that match the filters."""
+    query = {"user_id": str(user_id)}
+    if filters is None:
+        return query
+
+    if filters.start or filters.end:
+        query["date"] = {}
+        if filters.start:
+            query["date"]["$gte"] = filters.start
+        if filters.end:
+            query["date"]["$lt"] = filters.end
+    if filters.type:
+        query["type"] = filters.type.value
+    if filters.categories:
+        query["categories"] = {"$in": filters.categories}
+    if filters.currency:
+        query["currency"] = filters.currency.upper()
+    if filters.min_amount is not None or filters.max_amount is not None:
+        currency = (filters.currency or DEFAULT_CURRENCY).upper()
+        # The bounds are in minor units of this currency, which mean other amounts in others
+        query["currency"] = currency
+        query["amount_minor"] = {}
+        # Bounds finer than the minor unit are rounded inwards, matching the same stored amounts
+        if filters.min_amount is not None:
+            query["amount_minor"]["$gte"] = to_minor_units(filters.min_amount, currency, ROUND_CEILING)
+        if filters.max_amount is not None:
+            query["amount_minor"]["$lte"] = to_minor_units(filters.max_amount, currency, ROUND_FLOOR)
+    if filters.search:
+        # Uses the (user_id, description) text index
+        query["$text"] = {"$search": filters.search}
+    return query
+
+
+def _is_month_start(value: datetime) -> bool:
+    """Whether a datetime is midnight on the first day of a month in UTC."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.day == 1 and value.time() == datetime.min.time()
+
+
+def summary_pipeline(
+    user_id: UUID,
+    group_by: SummaryGroupBy,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> list:
+    """Build the aggregation pipeline summing a user's income and expenses per group."""
+    pipeline = [{"$match": transaction_query(user_id, TransactionFilters(start=start, end=end))}]
+    if group_by == SummaryGroupBy.CATEGORY:
+        # A transaction with several categories counts towards each of them, and
+        # once towards a category listed twice, as in the rollups
+        pipeline += [
+            {"$set": {"categories": {"$setUnion": ["$categories", []]}}},
+            {"$unwind": "$categories"},
+        ]
+        key = "$categories"
+    else:
+        date_format = "%Y-%m" if group_by == SummaryGroupBy.MONTH else "%G-W%V"
+        key = {"$dateToString": {"format": date_format, "date": {"$toDate": "$date"}}}
+
+    pipeline += [
+        {"$group": {
+            # Amounts in different currencies are never added together
+            "_id": {"key": key, "currency": {"$ifNull": ["$currency", DEFAULT_CURRENCY]}},
+            "income": {"$sum": {"$cond": [{"$eq": ["$type", "income"]}, "$amount_minor", 0]}},
+            "expense": {"$sum": {"$cond": [{"$eq": ["$type", "expense"]}, "$amount_minor", 0]}},
+            "count": {"$sum": 1}
+        }},
+        {"$sort": {"_id.key": 1, "_id.currency": 1}}
+    ]
+    return pipeline
+
 
 class TransactionService:
+    # Indexes backing the queries below, created at startup by ensure_indexes
+    INDEXES = [
+        IndexModel([("user_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="user_id_date"),
+        # Filters on type or categories listed by date
+        IndexModel(
+            [("user_id", ASCENDING), ("type", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)],
+            name="user_id_type_date"
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("categories", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)],
+            name="user_id_categories_date"
+        ),
+        # Amount ranges, which are always in one currency, and listings in a currency sorted by amount
+        IndexModel(
+            [("user_id", ASCENDING), ("currency", ASCENDING), ("amount_minor", DESCENDING), ("_id", DESCENDING)],
+            name="user_id_currency_amount"
+        ),
+        # Description search; the user_id prefix restricts it to one user's entries
+        IndexModel([("user_id", ASCENDING), ("description", TEXT)], name="user_id_description_text"),
+    ]
+    # Replaced indexes, dropped by ensure_indexes
+    LEGACY_INDEXES = ["user_id_amount"]
+
     def __init__(self):
         self.db = db
+        self.insert_batcher: Optional[WriteBatcher[dict]] = None
+        if TRANSACTION_WRITE_BATCHING:
+            self.insert_batcher = WriteBatcher(
+                self._insert_batch, TRANSACTION_BATCH_MAX_DOCS, TRANSACTION_BATCH_WINDOW_MS / 1000, name="transactions"
+            )
 
     @property
     def collection(self):
         return self.db.db.transactions if hasattr(self.db, 'db') and self.db.db is not None else None
 
-    async def create_transaction(self, transaction: Transaction):
+    @property
+    def analytics_collection(self):
+        """The collection for summary and export reads, which may be served by secondaries."""
+        database = self.db.analytics_db if self.db.analytics_db is not None else self.db.db
+        return database.transactions if database is not None else None
+
+    async def ensure_indexes(self):
+        """Create the indexes in INDEXES. Safe to call on every startup."""
         if self.collection is None:
             raise Exception("Database not initialized")
+        existing = await self.collection.index_information()
+        for name in self.LEGACY_INDEXES:
+            if name in existing:
+                await self.collection.drop_index(name)
+        await self.collection.create_indexes(self.INDEXES)
 
-        transaction_dict = transaction.model_dump()
+    async def create_transaction(self, transaction: Transaction):
+        if self.collection is None:
+            raise Exception("Database not initialized")
 
-        # Convert UUID to string for MongoDB storage
-        transaction_dict["user_id"] = str(transaction_dict["user_id"])
-        
-        # Store type as string
-        if transaction_dict["type"] not in ["income", "expense"]:
-            raise ValueError("Transaction type must be either 'income' or 'expense'")
-        
-        # Convert datetime objects to ISO format strings
-        for field in ["date", "created_at", "updated_at"]:
-            if transaction_dict.get(field):
-                transaction_dict[field] = transaction_dict[field].isoformat()
+        transaction_dict = to_document(transaction)
 
         try:
+            if self.insert_batcher is not None:
+                # Written with the other transactions created meanwhile, and added to the rollups with them
+                await self.insert_batcher.submit(transaction_dict)
+                return transaction
             # Insert into database
             result = await self.collection.insert_one(transaction_dict)
             if not result.inserted_id:
                 raise Exception("Failed to insert transaction")
-            return transaction
         except Exception as e:
             print(f"Error inserting transaction: {str(e)}")
             raise Exception(f"Database error: {str(e)}")
-    async def get_user_transactions(self, user_id: UUID):
+        # Stored, so a rollup error is logged rather than failing the request
+        await rollup_service.add_inserted([transaction_dict])
+        return transaction
+
+    async def _insert_batch(self, documents: List[dict]) -> List[Optional[Exception]]:
+        """
+        Insert a batch of create_transaction documents and add them to the rollups.
+
+        One unordered insert_many writes the whole batch, so a failed document
+        does not stop the others; returns the error of each document, or None.
+        """
+        errors: List[Optional[Exception]] = [None] * len(documents)
+        try:
+            await self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                errors[write_error["index"]] = WriteError(
+                    write_error.get("errmsg", "Write failed"), write_error.get("code"), write_error
+                )
+        await rollup_service.add_inserted(document for document, error in zip(documents, errors) if error is None)
+        return errors
+
+    async def flush_writes(self):
+        """Write the transactions waiting for a batch, e.g. on shutdown."""
+        if self.insert_batcher is not None:
+            await self.insert_batcher.flush()
+
+    async def import_transactions(self, user_id: UUID, rows: AsyncIterator[ParsedRow]) -> ImportReport:
+        """
+        Validate and insert parsed import rows for a user in batches.
+
+        Rows are consumed as the parser produces them and written with unordered
+        insert_many calls, so at most one batch is held in memory. Rows that fail
+        validation or insertion are listed in the report and do not stop the import.
+        """
+        if self.collection is None:
+            raise Exception("Database not initialized")
+
+        report = ImportReport()
+        batch = []
+
+        def add_error(row: int, error: str):
+            report.failed += 1
+            if len(report.errors) < MAX_REPORTED_ERRORS:
+                report.errors.append(ImportRowError(row=row, error=error))
+            else:
+                report.errors_truncated = True
+
+        async def flush():
+            documents = [document for _, document in batch]
+            failed = set()
+            try:
+                result = await self.collection.insert_many(documents, ordered=False)
+                report.inserted += len(result.inserted_ids)
+            except BulkWriteError as e:
+                report.inserted += e.details.get("nInserted", 0)
+                for write_error in e.details.get("writeErrors", []):
+                    failed.add(write_error["index"])
+                    add_error(batch[write_error["index"]][0], write_error.get("errmsg", "Write failed"))
+            await rollup_service.add_inserted(document for index, document in enumerate(documents) if index not in failed)
+            batch.clear()
+
+        async for row, fields in rows:
+            if isinstance(fields, RowError):
+                add_error(row, str(fields))
+                continue
+            try:
+                transaction = Transaction(user_id=user_id, **fields)
+                batch.append((row, to_document(transaction)))
+            except ValidationError as e:
+                add_error(row, "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+                ))
+            except ValueError as e:
+                add_error(row, str(e))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await flush()
+        if batch:
+            await flush()
+        return report
+
+    async def get_user_transactions(
+        self,
+        user_id: UUID,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        filters: Optional[TransactionFilters] = None,
+        sort: TransactionSort = TransactionSort.DATE_DESC
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Get one page of a user's transactions matching the filters, newest first by default.
+
+        Filtering and sorting happen in MongoDB on indexed fields. Pagination is
+        keyset based on (sort field, _id), so every page costs the same no matter
+        how deep into the history it is. Transactions are returned as JSON-ready
+        dicts (see to_api_row) rather than validated models.
+
+        Returns:
+            Tuple[List[dict], Optional[str]]: The transactions of the page and the
+            cursor for the next page, or None when this is the last page
+        """
+        if self.collection is None:
+            raise Exception("Database not initialized")
+
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        query = transaction_query(user_id, filters)
+        if cursor:
+            query.update(keyset_condition(cursor, sort))
+
+        # Fetch one extra document to know whether another page exists
+        documents = await self.collection.find(query, READ_PROJECTION).sort(SORTS[sort]).limit(limit + 1).to_list(length=limit + 1)
+        next_cursor = encode_cursor(documents[limit - 1], sort) if len(documents) > limit else None
+        return [to_api_row(transaction) for transaction in documents[:limit]], next_cursor
+
+    async def get_summary(
+        self,
+        user_id: UUID,
+        group_by: SummaryGroupBy,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> List[SummaryBucket]:
+        """
+        Get a user's income and expense totals per month, ISO week or category.
+
+        The sums are computed by MongoDB, so only one bucket per group is returned.
+        Month and category totals over whole months are read from the rollups instead,
+        once they have been built (see RollupService.is_built).
+
+        Args:
+            user_id (UUID): The ID of the user
+            group_by (SummaryGroupBy): How to group the transactions
+            start (Optional[datetime]): Only include transactions on or after this date
+            end (Optional[datetime]): Only include transactions before this date
+
+        Returns:
+            List[SummaryBucket]: The totals of each group, sorted by key
+        """
         if self.collection is None:
             raise Exception("Database not initialized")
-            
-        transactions = []
-        async for transaction in self.collection.find({"user_id": str(user_id)}):
-            # Convert MongoDB _id to string and remove it
-            if "_id" in transaction:
-                transaction["_id"] = str(transaction["_id"])
-                del transaction["_id"]
-            transactions.append(Transaction(**transaction))
-        return transactions
+
+        # Month and category totals over whole months can be read from the rollups
+        if (
+            group_by != SummaryGroupBy.WEEK
+            and all(_is_month_start(bound) for bound in (start, end) if bound)
+            and await rollup_service.is_built()
+        ):
+            return await rollup_service.get_summary(
+                user_id,
+                group_by,
+                rollup_month(start) if start else None,
+                rollup_month(end) if end else None
+            )
+
+        buckets = []
+        async for group in self.analytics_collection.aggregate(summary_pipeline(user_id, group_by, start, end)):
+            currency = group["_id"]["currency"]
+            buckets.append(SummaryBucket(
+                key=group["_id"]["key"],
+                currency=currency,
+                income=from_minor_units(group["income"], currency),
+                expense=from_minor_units(group["expense"], currency),
+                count=group["count"]
+            ))
+        return buckets
+
+    async def iter_export_documents(
+        self,
+        user_id: UUID,
+        filters: Optional[TransactionFilters] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Yield the stored documents of a user's transactions for export, oldest first.
+
+        Filters are applied by the query and documents are fetched EXPORT_BATCH_SIZE
+        at a time, so memory use does not depend on the length of the history.
+        """
+        if self.collection is None:
+            raise Exception("Database not initialized")
+
+        query = transaction_query(user_id, filters)
+        cursor = self.analytics_collection.find(query, EXPORT_PROJECTION).sort(EXPORT_SORT).batch_size(EXPORT_BATCH_SIZE)
+        async for document in cursor:
+            yield normalize_document(document)
+
+    async def iter_user_transactions(self, user_id: UUID) -> AsyncIterator[dict]:
+        """Yield all of a user's transactions, newest first, as JSON-ready dicts (see to_api_row) as the cursor produces them."""
+        if self.collection is None:
+            raise Exception("Database not initialized")
+
+        # Read from the primary like the paginated listing, so a transaction just written is included
+        async for transaction in self.collection.find({"user_id": str(user_id)}, READ_PROJECTION).sort(HISTORY_SORT):
+            yield to_api_row(transaction)
+
 # Create a global instance
 transaction_service = TransactionService()
\ No newline at end of file
@@ -1,20 +1,45 @@
 from typing import Optional
 from uuid import UUID
+from app.core.cache import TTLCache
+from app.core.singleflight import SingleFlight
 from app.core.database import db
 from app.models.user import UserCreate, UserInDB, UserResponse, OAuthInfo
-from app.core.security import get_password_hash, verify_password
+from app.core.security import PasswordHashPoolFull, verify_password_async
 from datetime import datetime, timezone
 from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
 from fastapi import HTTPException
 import logging
+import os
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Principals kept for authenticated requests, and for how long another instance's writes may go unseen
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+# Fields never needed to authenticate a request
+PRINCIPAL_PROJECTION = {"_id": 0, "hashed_password": 0}
+
 class UserService:
+    # Indexes backing the queries below, created at startup by ensure_indexes.
+    # The users collection also holds custom categories, so these cover CategoryService too.
+    INDEXES = [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("oauth_info.provider", ASCENDING), ("oauth_info.provider_user_id", ASCENDING)],
+            name="oauth_provider_user_id",
+            partialFilterExpression={"oauth_info.provider": {"$exists": True}}
+        ),
+    ]
+
     def __init__(self):
         self.db = db
+        self.principal_cache = TTLCache[UserInDB](USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS, name="users")
+        # Concurrent lookups of the same user (e.g. a dashboard's parallel requests) share one query
+        self.lookups = SingleFlight(name="users")
+        # Bumped by invalidate_user, so that lookups started before a write do not cache what they read
+        self._invalidations = 0
         logger.info("UserService initialized")
     
     @property
@@ -24,6 +49,13 @@ class UserService:
             return None
         return self.db.db.users
     
+    async def ensure_indexes(self):
+        """Create the indexes in INDEXES. Safe to call on every startup."""
+        if self.collection is None:
+            raise Exception("Database not initialized")
+        await self.collection.create_indexes(self.INDEXES)
+        logger.info("User indexes ensured")
+
     async def create_user(self, user: UserCreate) -> UserInDB:
         """Create a new user in the database."""
         try:
@@ -86,11 +118,13 @@ class UserService:
             if not user.hashed_password:
                 logger.error(f"User has no password: {email}")
                 return None
-            if not verify_password(password, user.hashed_password):
+            if not await verify_password_async(password, user.hashed_password):
                 logger.info(f"Invalid password for user: {email}")
                 return None
             logger.info(f"User authenticated successfully: {email}")
             return user
+        except PasswordHashPoolFull:
+            raise
         except Exception as e:
             logger.error(f"Error authenticating user: {str(e)}")
             logger.exception(e)
@@ -158,7 +192,7 @@ class UserService:
                 raise Exception("Database not initialized")
                 
             logger.info(f"Getting user by ID: {user_id}")
-            user_data = await self.collection.find_one({"id": user_id})
+            user_data = await self.lookups.do(("user", user_id), lambda: self.collection.find_one({"id": user_id}))
             if user_data is None:
                 logger.info(f"No user found by ID: {user_id}")
                 return None
@@ -170,6 +204,47 @@ class UserService:
             logger.exception(e)
             return None
 
+    async def get_principal(self, user_id: str) -> Optional[UserInDB]:
+        """
+        Get the user behind an authenticated request, from the principal cache when possible.
+
+        The returned user has no hashed_password and is shared between requests,
+        so it must not be modified.
+        
+        Args:
+            user_id (str): The ID of the user to retrieve
+            
+        Returns:
+            Optional[UserInDB]: The user if found, None otherwise
+        """
+        user = self.principal_cache.get(user_id)
+        if user is not None:
+            return user
+
+        if self.collection is None:
+            logger.error("Database not initialized")
+            raise Exception("Database not initialized")
+        return await self.lookups.do(("principal", user_id), lambda: self._load_principal(user_id))
+
+    async def _load_principal(self, user_id: str) -> Optional[UserInDB]:
+        invalidations = self._invalidations
+        user_data = await self.collection.find_one({"id": user_id}, PRINCIPAL_PROJECTION)
+        if user_data is None:
+            return None
+        user = UserInDB(**user_data)
+        if invalidations == self._invalidations:
+            self.principal_cache.set(user_id, user)
+        return user
+
+    def invalidate_user(self, user_id):
+        """Drop a user from the principal cache after writing to it."""
+        user_id = str(user_id)
+        self._invalidations += 1
+        self.principal_cache.invalidate(user_id)
+        # Lookups in flight may have read the user before the write
+        self.lookups.forget(("user", user_id))
+        self.lookups.forget(("principal", user_id))
+
     async def update_user(self, user_id: UUID, update_data: dict) -> Optional[UserInDB]:
         try:
             if self.collection is None:
@@ -183,6 +258,7 @@ class UserService:
                 {"id": str(user_id)},
                 {"$set": update_data}
             )
+            self.invalidate_user(user_id)
             if result.modified_count:
                 logger.info(f"User updated successfully with ID: {user_id}")
                 return await self.get_user_by_id(user_id)
@@ -193,6 +269,34 @@ class UserService:
             logger.exception(e)
             return None
 
+    async def update_password_hash(self, user_id: str, old_hash: str, new_hash: str) -> bool:
+        """
+        Replace a user's password hash, unless it changed since old_hash was read.
+
+        Args:
+            user_id (str): The ID of the user
+            old_hash (str): The hash the new one was computed to replace
+            new_hash (str): The new hash of the same password
+
+        Returns:
+            bool: True if the hash was replaced
+        """
+        try:
+            if self.collection is None:
+                logger.error("Database not initialized")
+                raise Exception("Database not initialized")
+
+            result = await self.collection.update_one(
+                {"id": user_id, "hashed_password": old_hash},
+                {"$set": {"hashed_password": new_hash, "updated_at": datetime.now(timezone.utc)}}
+            )
+            self.invalidate_user(user_id)
+            return result.modified_count == 1
+        except Exception as e:
+            logger.error(f"Error updating password hash: {str(e)}")
+            logger.exception(e)
+            return False
+
     async def update_user_oauth(self, user_id: str, oauth_info: OAuthInfo) -> Optional[UserInDB]:
         """Update user's OAuth information."""
         try:
@@ -216,6 +320,7 @@ class UserService:
                     "updated_at": datetime.now(timezone.utc)
                 }}
             )
+            self.invalidate_user(user_id)
             
             if result.modified_count == 0:
                 logger.error(f"Failed to update OAuth info for user {user_id}")
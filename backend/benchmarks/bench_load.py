@@ -0,0 +1,261 @@
+"""
+End-to-end load test of the API with regression thresholds.
+
+Runs the FastAPI app in-process, seeds users with transaction histories and
+drives concurrent login, create transaction, list transactions and categories
+workloads through HTTP. Reports p50/p95/p99 latency and throughput per
+workload, compares them with a stored baseline and exits non-zero if a
+workload regressed beyond the threshold.
+
+Uses the mongod at MONGODB_TEST_URL when set (in a throwaway database),
+otherwise mongomock-motor as an in-memory stand-in (pip install -r
+benchmarks/requirements.txt). Baselines are only comparable on the same
+host and database, so record one per environment with --update-baseline.
+
+Usage:
+    python -m benchmarks.bench_load [--users 20] [--transactions 500] [--requests 200] [--concurrency 10]
+    python -m benchmarks.bench_load --update-baseline
+"""
+import os
+
+# Limits meant for real clients would throttle the load test
+os.environ.setdefault("USER_QUOTA_UNITS", "1000000000")
+os.environ.setdefault("REVOCATION_BACKEND", "memory")
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import httpx
+from app.core.database import db
+from app.core.security import get_password_hash
+from app.models.transaction import Transaction
+from app.models.user import UserInDB
+from app.services.rollup_service import rollup_service
+from app.services.transaction_service import transaction_service, to_document
+from app.services.user_service import user_service
+
+BASELINE_PATH = Path(__file__).with_name("baseline_load.json")
+TEST_DATABASE = "personal_finance_bench"
+PASSWORD = "benchmark-password"
+CATEGORIES = ["Groceries", "Rent", "Transport", "Dining", "Utilities", "Salary", "Entertainment"]
+# Logins hash a password each, so they run fewer times than the other workloads
+LOGIN_SHARE = 0.1
+
+
+async def connect():
+    """Point the app at a throwaway database; returns a cleanup coroutine function."""
+    url = os.getenv("MONGODB_TEST_URL")
+    if url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        db.client = AsyncIOMotorClient(url)
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        db.client = AsyncMongoMockClient()
+    db.db = db.client[TEST_DATABASE]
+
+    async def cleanup():
+        await db.client.drop_database(TEST_DATABASE)
+        db.client.close()
+    return cleanup
+
+
+async def seed(users: int, transactions: int, rng: random.Random) -> list:
+    """Create users with custom categories and transaction histories; returns the users."""
+    for service in (user_service, transaction_service, rollup_service):
+        try:
+            await service.ensure_indexes()
+        except Exception as e:
+            # mongomock lacks some index types (e.g. text); queries still run
+            print(f"Skipping indexes for {type(service).__name__}: {e}")
+
+    await db.db.defaultCategories.insert_many([
+        {"type": "expense" if name != "Salary" else "income", "name": name} for name in CATEGORIES
+    ])
+    # One hash for everyone: hashing is what the login workload measures, not seeding
+    hashed_password = get_password_hash(PASSWORD)
+    now = datetime.now(timezone.utc)
+    seeded = []
+    for i in range(users):
+        user = UserInDB(email=f"bench{i}@example.com", name="Bench", surname=f"User{i}", hashed_password=hashed_password)
+        document = user.model_dump()
+        document["id"] = str(user.id)
+        document["customCategories"] = [{"type": "expense", "name": f"Custom {n}"} for n in range(3)]
+        await db.db.users.insert_one(document)
+        documents = [
+            to_document(Transaction(
+                user_id=user.id,
+                type="income" if n % 10 == 0 else "expense",
+                categories=[rng.choice(CATEGORIES)],
+                amount=f"{rng.randint(100, 500000) / 100:.2f}",
+                date=now - timedelta(hours=n * 7),
+                description=f"Transaction {n}"
+            ))
+            for n in range(transactions)
+        ]
+        await db.db.transactions.insert_many(documents)
+        await rollup_service.add(documents)
+        seeded.append(user)
+    # The rollups cover every seeded transaction, as after a rebuild
+    await rollup_service.mark_built()
+    return seeded
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+async def run_workload(name: str, request, count: int, concurrency: int) -> dict:
+    """Send count requests, concurrency at a time; returns latency percentiles (ms) and throughput."""
+    latencies = []
+    errors = 0
+    remaining = iter(range(count))
+
+    async def worker():
+        nonlocal errors
+        for i in remaining:
+            started = time.perf_counter()
+            response = await request(i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": count,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "throughput": count / elapsed,
+    }
+
+
+async def run(args) -> dict:
+    # Imported here so the environment above applies to the app's settings
+    import main
+
+    rng = random.Random(args.seed)
+    cleanup = await connect()
+    try:
+        users = await seed(args.users, args.transactions, rng)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def login_as(user, address: int):
+                # A distinct client address per login keeps the per-IP login limit out of the measurement
+                return await client.post(
+                    "/api/auth/login",
+                    json={"email": user.email, "password": PASSWORD},
+                    headers={"X-Forwarded-For": f"10.{address // 65536 % 256}.{address // 256 % 256}.{address % 256}"}
+                )
+
+            async def login(i):
+                return await login_as(users[i % len(users)], i)
+
+            tokens = {}
+            for n, user in enumerate(users):
+                # Addresses above those of the login workload
+                response = await login_as(user, (1 << 23) + n)
+                response.raise_for_status()
+                tokens[user.id] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            async def create_transaction(i):
+                user = users[i % len(users)]
+                return await client.post("/api/transactions/create", headers=tokens[user.id], json={
+                    "user_id": str(user.id),
+                    "type": "expense",
+                    "categories": [CATEGORIES[i % len(CATEGORIES)]],
+                    "amount": "12.34",
+                    "date": datetime.now(timezone.utc).isoformat(),
+                    "description": f"Load test {i}"
+                })
+
+            async def list_transactions(i):
+                user = users[i % len(users)]
+                return await client.get(f"/api/transactions/user/{user.id}?limit=100", headers=tokens[user.id])
+
+            async def list_categories(i):
+                user = users[i % len(users)]
+                return await client.get(f"/api/categories/{user.id}", headers=tokens[user.id])
+
+            workloads = {
+                "login": (login, max(1, int(args.requests * LOGIN_SHARE))),
+                "create_transaction": (create_transaction, args.requests),
+                "list_transactions": (list_transactions, args.requests),
+                "list_categories": (list_categories, args.requests),
+            }
+            results = {}
+            for name, (request, count) in workloads.items():
+                results[name] = await run_workload(name, request, count, args.concurrency)
+            return results
+    finally:
+        await cleanup()
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Regressions of p95 latency or throughput beyond threshold (a fraction of the baseline)."""
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if result["p95_ms"] > expected["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {result['p95_ms']:.1f} ms vs baseline {expected['p95_ms']:.1f} ms")
+        if result["throughput"] < expected["throughput"] * (1 - threshold):
+            regressions.append(f"{name}: {result['throughput']:.0f} req/s vs baseline {expected['throughput']:.0f} req/s")
+        if result["errors"]:
+            regressions.append(f"{name}: {result['errors']} failed requests")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=20, help="Users to seed")
+    parser.add_argument("--transactions", type=int, default=500, help="Transactions seeded per user")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per workload (logins send a tenth)")
+    parser.add_argument("--concurrency", type=int, default=10, help="Requests in flight per workload")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed regression, as a fraction of the baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="Baseline file")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the generated data")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"\n{'workload':<20} {'requests':>8} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    for name, result in results.items():
+        print(
+            f"{name:<20} {result['requests']:>8} {result['errors']:>6} {result['p50_ms']:>8.1f} "
+            f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['throughput']:>8.0f}"
+        )
+
+    config = {key: getattr(args, key) for key in ("users", "transactions", "requests", "concurrency")}
+    config["database"] = "mongod" if os.getenv("MONGODB_TEST_URL") else "mongomock"
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps({"config": config, "results": results}, indent=2) + "\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to record one.")
+        return
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline["config"] != config:
+        print(f"\nWarning: baseline was recorded with {baseline['config']}, not {config}")
+    regressions = compare(results, baseline["results"], args.threshold)
+    if regressions:
+        print(f"\nRegressions beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\nNo regression beyond {args.threshold:.0%} of the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Per-row cost of validating and serializing the models every request builds.
+
+Measures construction (validation), model_dump and model_dump_json for
+Transaction, UserInDB, UserResponse and CategoryResponse, each over a batch of
+the size a request handles (a page of transactions, a category list, ...).
+The inputs are shaped like what the app passes in: JSON request bodies for
+transactions, stored documents for users, model dumps for responses. No
+database is needed.
+
+Results are tracked in benchmarks/history_models.jsonl, one line per recorded
+run with its commit. Each run is compared with the latest recorded run on the
+same Python and pydantic versions and exits non-zero if any case got slower
+per row beyond the threshold.
+
+Usage:
+    python -m benchmarks.bench_models [--repeat 20] [--threshold 0.25]
+    python -m benchmarks.bench_models --record   # append the results to the history
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from uuid import uuid4
+import pydantic
+from app.models.transaction import Transaction
+from app.models.user import UserInDB, UserResponse
+from app.schemas.category import CategoryResponse
+
+HISTORY_PATH = Path(__file__).with_name("history_models.jsonl")
+CATEGORIES = ["Groceries", "Rent", "Transport", "Dining", "Utilities", "Salary", "Entertainment"]
+# Rows per batch: a page or import chunk of transactions, a user's categories, one user per request
+# (users are batched too, so that the timer's resolution does not dominate)
+TRANSACTION_BATCH = 500
+CATEGORY_BATCH = 50
+USER_BATCH = 100
+
+
+def transaction_inputs() -> list:
+    """Transactions as they arrive in create and import request bodies."""
+    user_id = str(uuid4())
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "user_id": user_id,
+            "type": "Income" if i % 10 == 0 else "expense",
+            "categories": [CATEGORIES[i % len(CATEGORIES)]],
+            "amount": f"{(i * 137) % 500000 / 100:.2f}",
+            "currency": "usd",
+            "date": (now - timedelta(hours=i)).isoformat(),
+            "description": f"Transaction {i}" if i % 3 else None,
+        }
+        for i in range(TRANSACTION_BATCH)
+    ]
+
+
+def user_inputs() -> list:
+    """Users as user_service reads them from the users collection."""
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": str(uuid4()),
+            "email": f"user{i}@example.com",
+            "name": "Bench",
+            "surname": f"User{i}",
+            "is_active": True,
+            "is_verified": i % 2 == 0,
+            "hashed_password": "$argon2id$v=19$m=65536,t=3,p=4$c2FsdHNhbHRzYWx0$aGFzaGhhc2hoYXNoaGFzaGhhc2hoYXNo",
+            "oauth_info": {"provider": "github", "provider_user_id": str(i)} if i % 5 == 0 else None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(USER_BATCH)
+    ]
+
+
+def category_inputs() -> list:
+    """Categories as category_service combines the defaults with a user's own."""
+    return [
+        {"type": "income" if i % 7 == 5 else "expense", "name": f"Category {i}", "is_default": i < len(CATEGORIES)}
+        for i in range(CATEGORY_BATCH)
+    ]
+
+
+def cases() -> dict:
+    """name -> (function processing a whole batch, rows in the batch)."""
+    transaction_data = transaction_inputs()
+    user_data = user_inputs()
+    category_data = category_inputs()
+    transactions = [Transaction(**data) for data in transaction_data]
+    users = [UserInDB(**data) for data in user_data]
+    # Routes build responses from the stored user's dump
+    user_dumps = [user.model_dump() for user in users]
+    responses = [UserResponse(**dump) for dump in user_dumps]
+    categories = [CategoryResponse(**data) for data in category_data]
+
+    def batch(function, items):
+        return lambda: [function(item) for item in items], len(items)
+
+    return {
+        "Transaction.validate": batch(lambda data: Transaction(**data), transaction_data),
+        "Transaction.model_dump": batch(lambda model: model.model_dump(), transactions),
+        "Transaction.model_dump_json": batch(lambda model: model.model_dump_json(), transactions),
+        "UserInDB.validate": batch(lambda data: UserInDB(**data), user_data),
+        "UserInDB.model_dump": batch(lambda model: model.model_dump(), users),
+        "UserInDB.model_dump_json": batch(lambda model: model.model_dump_json(), users),
+        "UserResponse.validate": batch(lambda dump: UserResponse(**dump), user_dumps),
+        "UserResponse.model_dump": batch(lambda model: model.model_dump(), responses),
+        "UserResponse.model_dump_json": batch(lambda model: model.model_dump_json(), responses),
+        "CategoryResponse.validate": batch(lambda data: CategoryResponse(**data), category_data),
+        "CategoryResponse.model_dump": batch(lambda model: model.model_dump(), categories),
+        "CategoryResponse.model_dump_json": batch(lambda model: model.model_dump_json(), categories),
+    }
+
+
+def measure(function, rows: int, repeat: int) -> float:
+    """Per-row cost in microseconds, from the fastest of repeat runs over the batch."""
+    function()  # warm up
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best / rows * 1e6
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "pydantic": pydantic.VERSION}
+
+
+def load_history(path: Path) -> list:
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+
+
+def compare(results: dict, previous: dict, threshold: float) -> list:
+    """Cases whose per-row cost grew beyond threshold (a fraction of the previous run)."""
+    return [
+        f"{name}: {cost:.2f} us/row vs {previous[name]:.2f} us/row"
+        for name, cost in results.items()
+        if name in previous and cost > previous[name] * (1 + threshold)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per case; the fastest counts")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed regression, as a fraction of the previous run")
+    parser.add_argument("--history", type=Path, default=HISTORY_PATH, help="History file")
+    parser.add_argument("--record", action="store_true", help="Append the results to the history")
+    args = parser.parse_args()
+
+    results = {name: measure(function, rows, args.repeat) for name, (function, rows) in cases().items()}
+    env = environment()
+    history = load_history(args.history)
+    previous = next(
+        (entry for entry in reversed(history)
+         if entry["python"] == env["python"] and entry["pydantic"] == env["pydantic"]),
+        None
+    )
+
+    print(f"{'case':<34} {'us/row':>8} {'rows/s':>10} {'previous':>9}")
+    for name, cost in results.items():
+        before = f"{previous['results'][name]:>9.2f}" if previous and name in previous["results"] else f"{'-':>9}"
+        print(f"{name:<34} {cost:>8.2f} {1e6 / cost:>10.0f} {before}")
+
+    if args.record:
+        entry = {"recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"), **env, "results": results}
+        with args.history.open("a") as history_file:
+            history_file.write(json.dumps(entry) + "\n")
+        print(f"\nRecorded in {args.history}")
+    if previous is None:
+        print(f"\nNo recorded run on Python {env['python']} and pydantic {env['pydantic']} to compare with.")
+        return
+
+    regressions = compare(results, previous["results"], args.threshold)
+    if regressions:
+        print(f"\nRegressions beyond {args.threshold:.0%} of the run recorded at {previous['commit']}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\nNo regression beyond {args.threshold:.0%} of the run recorded at {previous['commit']}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Cold-start time of the API against the startup budget.
+
+Starts fresh interpreters, like a new Cloud Run instance, and measures in each
+the import time of main, the lifespan startup (database setup and warm-up),
+the time from spawning the process to being ready to serve, and the latency
+of the first requests to the main routes. Reports the median of the runs and
+exits non-zero if any of them exceeds benchmarks/startup_budget.json.
+
+Uses the mongod at MONGODB_TEST_URL when set (in a throwaway database),
+otherwise mongomock-motor as an in-memory stand-in (pip install -r
+benchmarks/requirements.txt).
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BUDGET_PATH = Path(__file__).with_name("startup_budget.json")
+RESULT_PREFIX = "STARTUP_RESULT "
+
+
+async def _measure_requests(app, user, password: str) -> dict:
+    """Latency (ms) of the first request to each main route."""
+    import httpx
+
+    latencies = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def timed(name, request):
+            started = time.perf_counter()
+            response = await request
+            latencies[name] = (time.perf_counter() - started) * 1000
+            response.raise_for_status()
+            return response
+
+        await timed("root", client.get("/"))
+        response = await timed("login", client.post(
+            "/api/auth/login", json={"email": user.email, "password": password}, headers={"X-Forwarded-For": "10.0.0.1"}
+        ))
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        await timed("current_user", client.get("/api/users/me", headers=headers))
+        await timed("list_transactions", client.get(f"/api/transactions/user/{user.id}", headers=headers))
+        await timed("list_categories", client.get(f"/api/categories/{user.id}", headers=headers))
+    return latencies
+
+
+def child(spawned_at: float):
+    """One cold start; prints its measurements on a line starting with RESULT_PREFIX."""
+    import asyncio
+
+    started = time.perf_counter()
+    import main
+    import_ms = (time.perf_counter() - started) * 1000
+    # Includes the interpreter's own startup
+    imported_ms = (time.time() - spawned_at) * 1000
+
+    import random
+    from app.core.database import db
+    from benchmarks.bench_load import PASSWORD, connect, seed
+
+    async def run():
+        cleanup = await connect()
+        try:
+            users = await seed(1, 100, random.Random(0))
+            if os.getenv("MONGODB_TEST_URL"):
+                # A fresh client, so that opening connections is part of the measured startup
+                seeding_client = db.client
+                await connect()
+                seeding_client.close()
+
+            async def connected(app):
+                pass
+            # connect() already pointed the app at the throwaway database
+            db.connect_to_database = connected
+
+            started = time.perf_counter()
+            async with main.app.router.lifespan_context(main.app):
+                startup_ms = (time.perf_counter() - started) * 1000
+                # Seeding the database is not part of a real cold start
+                ready_ms = imported_ms + startup_ms
+                requests = await _measure_requests(main.app, users[0], PASSWORD)
+            return {"import_ms": import_ms, "startup_ms": startup_ms, "ready_ms": ready_ms, "first_request_ms": requests}
+        finally:
+            await cleanup()
+
+    print(RESULT_PREFIX + json.dumps(asyncio.run(run())))
+
+
+def cold_start() -> dict:
+    """Run one cold start in a fresh interpreter and return its measurements."""
+    process = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", repr(time.time())],
+        capture_output=True, text=True
+    )
+    for line in process.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"Cold start failed:\n{process.stderr[-4000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to measure; the median counts")
+    parser.add_argument("--budget", type=Path, default=BUDGET_PATH, help="Budget file")
+    parser.add_argument("--child", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child is not None:
+        child(args.child)
+        return
+
+    runs = [cold_start() for _ in range(args.runs)]
+    medians = {key: statistics.median(run[key] for run in runs) for key in ("import_ms", "startup_ms", "ready_ms")}
+    medians["first_request_ms"] = {
+        name: statistics.median(run["first_request_ms"][name] for run in runs) for name in runs[0]["first_request_ms"]
+    }
+    budget = json.loads(args.budget.read_text())
+
+    over = []
+    print(f"{'measure':<36} {'median ms':>10} {'budget ms':>10}")
+    rows = [(key, medians[key], budget.get(key)) for key in ("import_ms", "startup_ms", "ready_ms")]
+    rows += [
+        (f"first_request_ms.{name}", value, budget.get("first_request_ms", {}).get(name))
+        for name, value in medians["first_request_ms"].items()
+    ]
+    for name, value, limit in rows:
+        print(f"{name:<36} {value:>10.1f} {limit if limit is not None else '-':>10}")
+        if limit is not None and value > limit:
+            over.append(f"{name}: {value:.1f} ms, budget {limit} ms")
+
+    if over:
+        print(f"\nOver the startup budget ({args.budget}):")
+        for line in over:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nWithin the startup budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Per-row cost of serializing a page of transactions read from MongoDB.
+
+Compares the model path (Transaction built and revalidated for every stored
+document, then serialized by pydantic) with the lean path used by the API
+(to_api_row on the stored document, encoded with orjson). No database is
+needed; stored documents are generated in memory.
+
+Usage:
+    python -m benchmarks.bench_transaction_read [--rows 500] [--repeat 20]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+from bson import ObjectId
+import orjson
+from app.schemas.transaction import TransactionPage
+from app.services.transaction_service import from_document, to_api_row
+
+
+def stored_documents(rows: int) -> list:
+    """Documents shaped like the transactions collection stores them."""
+    user_id = str(uuid4())
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "_id": ObjectId(),
+            "user_id": user_id,
+            "type": "expense" if i % 4 else "income",
+            "categories": ["Groceries", "Food"] if i % 2 else ["Rent"],
+            "amount_minor": 1000 + i,
+            "currency": "USD",
+            "date": now - timedelta(days=i),
+            "description": f"Transaction {i}",
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(rows)
+    ]
+
+
+def model_path(documents: list) -> bytes:
+    items = [from_document(dict(document)) for document in documents]
+    return TransactionPage(items=items, next_cursor=None).model_dump_json().encode()
+
+
+def lean_path(documents: list) -> bytes:
+    items = [to_api_row(dict(document)) for document in documents]
+    return orjson.dumps({"items": items, "next_cursor": None})
+
+
+def best_time(function, documents: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(documents)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=500, help="Transactions per page")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per path; the fastest is reported")
+    args = parser.parse_args()
+
+    documents = stored_documents(args.rows)
+    # Both paths must produce the same JSON
+    assert orjson.loads(model_path(documents)) == orjson.loads(lean_path(documents))
+
+    model = best_time(model_path, documents, args.repeat)
+    lean = best_time(lean_path, documents, args.repeat)
+    print(f"{args.rows} rows per page, best of {args.repeat}")
+    print(f"model path: {model * 1e6 / args.rows:8.2f} us/row")
+    print(f"lean path:  {lean * 1e6 / args.rows:8.2f} us/row  ({model / lean:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
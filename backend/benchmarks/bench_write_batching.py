@@ -0,0 +1,151 @@
+"""
+Throughput and per-insert latency of create_transaction with and without write batching.
+
+Creates transactions through TransactionService at several concurrency
+levels, once inserting each one on its own (TRANSACTION_WRITE_BATCHING off)
+and once coalescing concurrent inserts into insert_many batches, and reports
+inserts per second, p50/p99 latency per insert and the mean batch size. The
+batching window is the latency a lone insert pays for it; the round trips
+saved are what concurrent inserts gain.
+
+Uses the mongod at MONGODB_TEST_URL when set (in a throwaway database),
+otherwise mongomock-motor as an in-memory stand-in (pip install -r
+benchmarks/requirements.txt). mongomock answers without a network round
+trip, which is what batching saves, so each of its writes is delayed by
+--round-trip-ms to stand in for one.
+
+Usage:
+    python -m benchmarks.bench_write_batching [--inserts 2000] [--concurrency 1,10,50,200] [--window-ms 2] [--max-docs 500]
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+from app.core.batching import WriteBatcher
+from app.core.database import db
+from app.models.transaction import Transaction
+from app.services.transaction_service import transaction_service
+from benchmarks.bench_load import CATEGORIES, connect, percentile
+
+# Writes a create_transaction makes, delayed by the simulated round trip
+WRITE_METHODS = ("insert_one", "insert_many", "bulk_write")
+
+
+class RoundTripCollection:
+    """A collection whose writes take a simulated network round trip."""
+    def __init__(self, collection, seconds: float):
+        self._collection = collection
+        self._seconds = seconds
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if name not in WRITE_METHODS:
+            return attribute
+
+        async def delayed(*args, **kwargs):
+            await asyncio.sleep(self._seconds)
+            return await attribute(*args, **kwargs)
+        return delayed
+
+
+class RoundTripDatabase:
+    """A database whose collections' writes take a simulated network round trip."""
+    def __init__(self, database, seconds: float):
+        self._database = database
+        self._seconds = seconds
+
+    def __getattr__(self, name):
+        return RoundTripCollection(getattr(self._database, name), self._seconds)
+
+    def __getitem__(self, name):
+        return RoundTripCollection(self._database[name], self._seconds)
+
+
+async def run_inserts(count: int, concurrency: int, rng: random.Random) -> dict:
+    """Create count transactions, concurrency at a time; returns throughput and latency per insert (ms)."""
+    user_ids = [uuid4() for _ in range(20)]
+    now = datetime.now(timezone.utc)
+    transactions = [
+        Transaction(
+            user_id=rng.choice(user_ids),
+            type="expense",
+            categories=[rng.choice(CATEGORIES)],
+            amount=f"{rng.randint(100, 500000) / 100:.2f}",
+            date=now,
+            description=f"Transaction {n}"
+        )
+        for n in range(count)
+    ]
+    remaining = iter(transactions)
+    latencies = []
+
+    async def worker():
+        for transaction in remaining:
+            started = time.perf_counter()
+            await transaction_service.create_transaction(transaction)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "throughput": count / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def run(args) -> list:
+    cleanup = await connect()
+    if not os.getenv("MONGODB_TEST_URL") and args.round_trip_ms:
+        db.db = RoundTripDatabase(db.db, args.round_trip_ms / 1000)
+    rng = random.Random(args.seed)
+    results = []
+    try:
+        for concurrency in args.concurrency:
+            for batching in (False, True):
+                batcher = None
+                if batching:
+                    batcher = WriteBatcher(
+                        transaction_service._insert_batch, args.max_docs, args.window_ms / 1000, name="bench"
+                    )
+                transaction_service.insert_batcher = batcher
+                result = await run_inserts(args.inserts, concurrency, rng)
+                result["mean_batch"] = args.inserts / batcher.batches if batcher else 1
+                results.append((concurrency, batching, result))
+    finally:
+        transaction_service.insert_batcher = None
+        await cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--inserts", type=int, default=2000, help="Transactions created per run")
+    parser.add_argument(
+        "--concurrency", type=lambda value: [int(n) for n in value.split(",")], default=[1, 10, 50, 200],
+        help="Comma-separated inserts in flight, one run each"
+    )
+    parser.add_argument("--window-ms", type=float, default=2, help="Batching window (TRANSACTION_BATCH_WINDOW_MS)")
+    parser.add_argument("--max-docs", type=int, default=500, help="Batch size limit (TRANSACTION_BATCH_MAX_DOCS)")
+    parser.add_argument(
+        "--round-trip-ms", type=float, default=1, help="Simulated round trip of each mongomock write (ignored with a mongod)"
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the generated data")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"\n{'concurrency':>11} {'batching':>8} {'inserts/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'mean batch':>10}")
+    for concurrency, batching, result in results:
+        print(
+            f"{concurrency:>11} {'on' if batching else 'off':>8} {result['throughput']:>10.0f} "
+            f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['mean_batch']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
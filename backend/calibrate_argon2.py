@@ -0,0 +1,69 @@
+import argparse
+import statistics
+import time
+from itertools import product
+from dotenv import load_dotenv
+from passlib.hash import argon2
+
+# The current parameters may be set in .env, which the app loads in app/core/database.py
+load_dotenv()
+
+from app.core.security import ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM
+
+TIME_COSTS = [1, 2, 3, 4, 6]
+MEMORY_COSTS_MB = [19, 32, 46, 64, 100, 128, 256]
+PARALLELISMS = [1, 2, 4, 8]
+PASSWORD = "calibration-password-0123456789"
+
+
+def measure(time_cost: int, memory_cost: int, parallelism: int, samples: int) -> float:
+    """Median time in milliseconds to verify a password with these parameters."""
+    hasher = argon2.using(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+    hashed = hasher.hash(PASSWORD)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.verify(PASSWORD, hashed)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(target_ms: float, max_memory_mb: int, max_parallelism: int, samples: int):
+    current = (ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM)
+    print(f"Current parameters: time_cost={current[0]} memory_cost={current[1]} parallelism={current[2]}")
+    print(f"Current cost: {measure(*current, samples):.0f} ms\n")
+
+    print(f"{'time':>4} {'memory (MB)':>11} {'parallel':>8} {'ms':>7}")
+    candidates = []
+    for memory_mb, parallelism in product(MEMORY_COSTS_MB, PARALLELISMS):
+        if memory_mb > max_memory_mb or parallelism > max_parallelism:
+            continue
+        for time_cost in TIME_COSTS:
+            elapsed = measure(time_cost, memory_mb * 1024, parallelism, samples)
+            print(f"{time_cost:>4} {memory_mb:>11} {parallelism:>8} {elapsed:>7.0f}")
+            if elapsed > target_ms:
+                # Higher time costs with the same memory only get slower
+                break
+            candidates.append((memory_mb * time_cost, memory_mb, time_cost, parallelism, elapsed))
+
+    if not candidates:
+        print(f"\nNo parameters verify within {target_ms:.0f} ms on this host; raise --target-ms or lower the memory.")
+        return
+
+    # The strongest parameters within the budget: most memory x passes, then fewest lanes
+    _, memory_mb, time_cost, parallelism, elapsed = max(candidates, key=lambda c: (c[0], c[1], -c[3]))
+    print(f"\nRecommended ({elapsed:.0f} ms, {memory_mb} MB per hash); add to .env:")
+    print(f"ARGON2_TIME_COST={time_cost}")
+    print(f"ARGON2_MEMORY_COST={memory_mb * 1024}")
+    print(f"ARGON2_PARALLELISM={parallelism}")
+    print("Set PASSWORD_HASH_MEMORY_BUDGET_MB to at least the memory per hash times the logins to verify at once.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Argon2 parameters on this host and recommend the strongest within budget.")
+    parser.add_argument("--target-ms", type=float, default=250, help="Maximum time to verify a password (default 250)")
+    parser.add_argument("--max-memory-mb", type=int, default=128, help="Maximum memory per hash in MB (default 128)")
+    parser.add_argument("--max-parallelism", type=int, default=8, help="Maximum Argon2 lanes (default 8)")
+    parser.add_argument("--samples", type=int, default=3, help="Verifications timed per candidate (default 3)")
+    args = parser.parse_args()
+    calibrate(args.target_ms, args.max_memory_mb, args.max_parallelism, args.samples)
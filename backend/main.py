@@ -1,5 +1,13 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+import os
 from fastapi.middleware.cors import CORSMiddleware
+import logging
+
+# Configured once for the app, before its modules log anything at import
+logging.basicConfig(level=logging.INFO)
+
+# Imported before the other app modules: loads .env before they read their settings
 from app.core.database import db
 from pydantic import BaseModel
 from datetime import datetime
@@ -7,18 +15,44 @@ from app.routes.user_routes import router as user_router
 from app.routes.transaction_routes import router as transaction_router
 from app.routes.category_routes import router as category_router
 from app.routes.auth_routes import router as auth_router
+from app.services.user_service import user_service
+from app.services.transaction_service import transaction_service
+from app.services.rollup_service import rollup_service
+from app.core.security import revocation_store
+from app.core.rate_limit import RateLimitMiddleware, rate_limiter
+from app.core.metrics import MetricsMiddleware, metrics
+from app.core.profiling import ProfilingMiddleware, profiling_enabled
+from app.core.warmup import STARTUP_WARMUP, warm_up
 from contextlib import asynccontextmanager
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await db.connect_to_database(app)
+    # Create the indexes each service declares; existing indexes are left untouched
+    for service in (user_service, transaction_service, rollup_service):
+        try:
+            await service.ensure_indexes()
+        except Exception as e:
+            # Keep serving (unindexed) rather than fail startup, e.g. on duplicate emails
+            print(f"Error creating indexes for {type(service).__name__}: {e}")
+    await revocation_store.start()
+    await rate_limiter.start()
+    # Open connections and run the request paths once, so the first requests after a cold start are not slower
+    if STARTUP_WARMUP:
+        await warm_up()
     yield
     # Shutdown
+    await transaction_service.flush_writes()
+    await rate_limiter.stop()
+    await revocation_store.stop()
     await db.close_database_connection()
 
 app = FastAPI(title="Personal Finance API", lifespan=lifespan)
 
+# Enforce the rate limit policies of the routes (added first so CORS headers wrap its 429s)
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +62,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Profile sampled or X-Profile requests; not installed at all unless enabled
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+
+# Time every request, including those rejected by the middleware above (added last so it runs first)
+app.add_middleware(MetricsMiddleware)
+
 # Include auth routes
 app.include_router(auth_router, prefix="/api", tags=["auth"])
 
@@ -45,6 +86,16 @@ app.include_router(category_router, prefix="/api", tags=["categories"])
 async def root():
     return {"message": "Welcome to Personal Finance API"}
 
+# When set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(request: Request):
+    """Request, MongoDB and process metrics in the Prometheus text format."""
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/test-db")
 async def test_db():
     try:
@@ -0,0 +1,24 @@
+import argparse
+import asyncio
+import logging
+from app.core.database import db
+from app.services.migration_service import migration_service
+
+async def migrate_transaction_dates(batch_size: int, pause_seconds: float):
+    try:
+        await db.connect_to_database(None)
+        progress = await migration_service.migrate_transaction_dates(batch_size, pause_seconds)
+        print(f"Done: {progress['converted']} transactions converted, {progress['failed']} failed.")
+    finally:
+        await db.close_database_connection()
+
+if __name__ == "__main__":
+    # Shows the migration's progress
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Convert transaction dates stored as ISO strings to native datetimes. Safe to interrupt and rerun."
+    )
+    parser.add_argument("--batch-size", type=int, default=500, help="Transactions rewritten per bulk write")
+    parser.add_argument("--pause", type=float, default=0.1, help="Seconds to sleep between batches")
+    args = parser.parse_args()
+    asyncio.run(migrate_transaction_dates(args.batch_size, args.pause))
@@ -0,0 +1,22 @@
+import argparse
+import asyncio
+from uuid import UUID
+from app.core.database import db
+from app.services.rollup_service import rollup_service
+
+async def rebuild_rollups(user_id: UUID = None):
+    try:
+        await db.connect_to_database(None)
+        await rollup_service.ensure_indexes()
+
+        print(f"Rebuilding transaction rollups for {f'user {user_id}' if user_id else 'all users'}...")
+        await rollup_service.rebuild(user_id)
+        print("Transaction rollups rebuilt.")
+    finally:
+        await db.close_database_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the transaction_rollups collection from the transactions.")
+    parser.add_argument("--user-id", type=UUID, help="Only rebuild the rollups of this user")
+    args = parser.parse_args()
+    asyncio.run(rebuild_rollups(args.user_id))
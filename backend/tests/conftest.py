@@ -0,0 +1,18 @@
+import os
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+
+@pytest.fixture(scope="session")
+def mongodb_url() -> str:
+    """URL of the mongod the database checks run against (MONGODB_TEST_URL); skips them when none is reachable."""
+    url = os.getenv("MONGODB_TEST_URL", "mongodb://localhost:27017")
+    client = MongoClient(url, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"No mongod reachable at {url}")
+    finally:
+        client.close()
+    return url
@@ -0,0 +1,66 @@
+"""
+Check that the password hash pool stays bounded when callers are cancelled.
+
+A cancelled caller (e.g. a client that disconnected during login) must keep
+its place in the pool while its hash still runs, so that admission keeps
+rejecting once max_workers + max_queue hashes are really running or waiting.
+Exits with code 1 if a check fails. Needs no database.
+
+Usage:
+    python -m tests.test_password_hash_pool
+    pytest tests/test_password_hash_pool.py
+"""
+import sys
+import asyncio
+import threading
+from app.core.security import PasswordHashPool, PasswordHashPoolFull
+
+
+async def admitted(pool: PasswordHashPool, func) -> bool:
+    """Whether the pool accepts func, which is then left running in the background."""
+    task = asyncio.ensure_future(pool.run(func))
+    # Lets run() either submit func or raise
+    await asyncio.sleep(0)
+    if task.done() and isinstance(task.exception(), PasswordHashPoolFull):
+        return False
+    return True
+
+
+async def check_cancelled_callers() -> bool:
+    pool = PasswordHashPool(max_workers=1, max_queue=1)
+    release = threading.Event()
+    ok = True
+
+    def check(name: str, passed: bool):
+        nonlocal ok
+        ok = ok and passed
+        print(f"{'ok  ' if passed else 'FAIL'} {name} (in flight: {pool.stats()['in_flight']})")
+
+    running = asyncio.ensure_future(pool.run(release.wait))
+    waiting = asyncio.ensure_future(pool.run(release.wait))
+    await asyncio.sleep(0.05)
+    check("a hash beyond the worker and the queue is rejected", not await admitted(pool, release.wait))
+
+    # Both callers go away: the waiting hash is cancelled, the running one carries on
+    running.cancel()
+    waiting.cancel()
+    await asyncio.gather(running, waiting, return_exceptions=True)
+    check("the running hash keeps its place", pool.stats()["in_flight"] == 1)
+    check("the cancelled hash frees the queue", await admitted(pool, release.wait))
+    check("admission still rejects beyond the worker and the queue", not await admitted(pool, release.wait))
+
+    release.set()
+    for _ in range(100):
+        if pool.stats()["in_flight"] == 0:
+            break
+        await asyncio.sleep(0.01)
+    check("every place is released once the hashes are done", pool.stats()["in_flight"] == 0)
+    return ok
+
+
+def test_cancelled_callers():
+    assert asyncio.run(check_cancelled_callers()), "The pool admitted more hashes than it holds (see the output)"
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(check_cancelled_callers()) else 1)
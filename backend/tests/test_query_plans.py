@@ -0,0 +1,162 @@
+"""
+Query plan check for every query the services run.
+
+Runs explain() for each query against a local mongod and fails (exit code 1)
+if any winning plan contains a COLLSCAN stage, i.e. a query is missing an index.
+Also checks that amount filters only match transactions in their currency.
+
+Usage:
+    MONGODB_TEST_URL=mongodb://localhost:27017 python -m tests.test_query_plans
+    pytest tests/test_query_plans.py   # skipped when no mongod is reachable
+"""
+import os
+import sys
+import asyncio
+from datetime import datetime, timezone
+from uuid import uuid4
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.database import db
+from app.services.user_service import user_service
+from app.services.rollup_service import rollup_service
+from app.core.revocation import MongoRevocationBackend
+from app.models.transaction import Transaction
+from app.services.transaction_service import (
+    transaction_service, SORTS, EXPORT_SORT, EXPORT_PROJECTION, READ_PROJECTION, summary_pipeline, to_document,
+    transaction_query
+)
+from app.schemas.transaction import SummaryGroupBy, TransactionFilters, TransactionSort, TransactionType
+
+TEST_DATABASE = "personal_finance_query_plans"
+
+
+def find_stages(plan, stages=None, in_winning_plan=False):
+    """Collect the stage names of every winning plan in an explain output (find or aggregate)."""
+    if stages is None:
+        stages = []
+    if isinstance(plan, dict):
+        if in_winning_plan and "stage" in plan:
+            stages.append(plan["stage"])
+        for key, value in plan.items():
+            if key != "rejectedPlans":
+                find_stages(value, stages, in_winning_plan or key == "winningPlan")
+    elif isinstance(plan, list):
+        for value in plan:
+            find_stages(value, stages, in_winning_plan)
+    return stages
+
+
+def service_queries(database):
+    """(name, explain coroutine) pairs mirroring the queries in the services."""
+    user_id = str(uuid4())
+    find_queries = [
+        ("users by email", database.users.find({"email": "user@example.com"}).limit(1)),
+        ("users by id", database.users.find({"id": user_id}).limit(1)),
+        ("users by oauth", database.users.find({
+            "oauth_info.provider": "github",
+            "oauth_info.provider_user_id": "12345"
+        }).limit(1)),
+        ("transactions export", database.transactions.find(transaction_query(user_id, TransactionFilters(
+            start=datetime(2024, 1, 1, tzinfo=timezone.utc), end=datetime(2025, 1, 1, tzinfo=timezone.utc), categories=["Groceries"]
+        )), EXPORT_PROJECTION).sort(EXPORT_SORT)),
+        ("revoked tokens since", database.revoked_tokens.find({
+            "revoked_at": {"$gte": datetime(2024, 1, 1, tzinfo=timezone.utc)},
+            "expires_at": {"$gt": datetime(2024, 1, 1, tzinfo=timezone.utc)}
+        }, {"_id": 1})),
+        ("rollups by month", database.transaction_rollups.find({
+            "user_id": user_id,
+            "category": None,
+            "month": {"$gte": "2024-01", "$lt": "2025-01"}
+        })),
+        ("rollups by category", database.transaction_rollups.find({
+            "user_id": user_id,
+            "category": {"$ne": None},
+            "month": {"$gte": "2024-01", "$lt": "2025-01"}
+        })),
+    ]
+    find_queries += [
+        (f"transactions {sort.value} filtered by {name}", database.transactions.find(
+            transaction_query(user_id, filters), READ_PROJECTION
+        ).sort(SORTS[sort]).limit(101))
+        for sort in TransactionSort
+        for name, filters in [
+            ("nothing", None),
+            ("date", TransactionFilters(start=datetime(2024, 1, 1, tzinfo=timezone.utc))),
+            ("type", TransactionFilters(type=TransactionType.EXPENSE)),
+            ("categories", TransactionFilters(categories=["Groceries", "Rent"])),
+            ("amount", TransactionFilters(min_amount=10, max_amount=100)),
+            ("currency", TransactionFilters(currency="JPY")),
+            ("amount in currency", TransactionFilters(currency="JPY", min_amount=1000, max_amount=3000)),
+            ("search", TransactionFilters(search="coffee")),
+        ]
+    ]
+    aggregations = [
+        (f"transactions summary by {group_by.value}", "transactions", summary_pipeline(
+            user_id, group_by, datetime(2024, 1, 1, tzinfo=timezone.utc), datetime(2025, 1, 1, tzinfo=timezone.utc)
+        ))
+        for group_by in SummaryGroupBy
+    ]
+    return [(name, cursor.explain()) for name, cursor in find_queries] + [
+        (name, database.command("aggregate", collection, pipeline=pipeline, explain=True))
+        for name, collection, pipeline in aggregations
+    ]
+
+
+async def check_amount_filters(database) -> bool:
+    """Amount bounds only match transactions in their currency, whose minor units they are converted to."""
+    user_id = uuid4()
+    date = datetime(2024, 1, 15, tzinfo=timezone.utc)
+    await database.transactions.insert_many([
+        to_document(Transaction(
+            user_id=user_id, type="expense", categories=["Dining"], amount=amount, currency=currency, date=date
+        ))
+        for amount, currency in [("20.00", "USD"), ("2000", "JPY")]
+    ])
+    ok = True
+    for name, filters, expected in [
+        # USD 19-21 is 1900-2100 minor units, which JPY 2000 also is
+        ("amount without currency", TransactionFilters(min_amount=19, max_amount=21), ["USD"]),
+        ("amount in JPY", TransactionFilters(currency="JPY", min_amount=1999, max_amount=2001), ["JPY"]),
+        # Bounds finer than the minor unit round inwards: 19.995 up to 20.00, 20.005 down to 20.00
+        ("amount with extra decimals", TransactionFilters(min_amount="19.995", max_amount="20.005"), ["USD"]),
+        ("amount above with extra decimals", TransactionFilters(min_amount="20.001"), []),
+        ("amount in JPY with decimals", TransactionFilters(currency="JPY", min_amount="1999.5", max_amount="2000.5"), ["JPY"]),
+    ]:
+        found = [document["currency"] async for document in database.transactions.find(transaction_query(user_id, filters))]
+        if found != expected:
+            ok = False
+            print(f"FAIL {name}: matched {found}, expected {expected}")
+        else:
+            print(f"ok   {name}: matched {found}")
+    return ok
+
+
+async def check_query_plans() -> bool:
+    MONGODB_TEST_URL = os.getenv("MONGODB_TEST_URL", "mongodb://localhost:27017")
+    client = AsyncIOMotorClient(MONGODB_TEST_URL)
+    db.client = client
+    db.db = client[TEST_DATABASE]
+    ok = True
+    try:
+        for service in (user_service, transaction_service, rollup_service, MongoRevocationBackend()):
+            await service.ensure_indexes()
+
+        for name, explain in service_queries(db.db):
+            stages = find_stages(await explain)
+            if "COLLSCAN" in stages:
+                ok = False
+                print(f"FAIL {name}: {' <- '.join(stages)}")
+            else:
+                print(f"ok   {name}: {' <- '.join(stages)}")
+        ok = await check_amount_filters(db.db) and ok
+    finally:
+        await client.drop_database(TEST_DATABASE)
+        client.close()
+    return ok
+
+
+def test_query_plans(mongodb_url):
+    assert asyncio.run(check_query_plans()), "A query plan scans the collection or a check failed (see the output)"
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(check_query_plans()) else 1)
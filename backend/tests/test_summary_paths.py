@@ -0,0 +1,93 @@
+"""
+Check that summaries read from the rollups match the aggregation over the transactions.
+
+Month and category summaries over whole months are served from the rollups,
+other date ranges by summary_pipeline. Both must count every transaction the
+same way (e.g. a category listed twice on a transaction once), so the same
+transactions give the same totals on either path. Exits with code 1 on a
+mismatch.
+
+Usage:
+    MONGODB_TEST_URL=mongodb://localhost:27017 python -m tests.test_summary_paths
+    pytest tests/test_summary_paths.py   # skipped when no mongod is reachable
+"""
+import os
+import sys
+import asyncio
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.database import db
+from app.models.transaction import Transaction
+from app.schemas.transaction import SummaryGroupBy
+from app.services.rollup_service import rollup_service
+from app.services.transaction_service import transaction_service, to_document
+
+TEST_DATABASE = "personal_finance_summary_paths"
+# Whole months, so get_summary reads the rollups
+MONTH_START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+MONTH_END = datetime(2024, 3, 1, tzinfo=timezone.utc)
+# Not month-aligned, so get_summary aggregates the transactions; covers the same ones
+ANY_START = MONTH_START - timedelta(hours=1)
+ANY_END = MONTH_END + timedelta(hours=1)
+
+
+def sample_documents(user_id) -> list:
+    """Stored transactions covering duplicate and multiple categories, both types and two currencies."""
+    samples = [
+        ("expense", ["Groceries", "Groceries"], "12.50", "USD", datetime(2024, 1, 5, tzinfo=timezone.utc)),
+        ("expense", ["Groceries", "Dining"], "30.00", "USD", datetime(2024, 1, 20, tzinfo=timezone.utc)),
+        ("expense", ["Rent"], "900.00", "USD", datetime(2024, 2, 1, tzinfo=timezone.utc)),
+        ("income", ["Salary", "Salary", "Bonus"], "2500.00", "USD", datetime(2024, 2, 15, tzinfo=timezone.utc)),
+        ("expense", ["Dining", "Dining"], "2000", "JPY", datetime(2024, 2, 28, 23, tzinfo=timezone.utc)),
+    ]
+    documents = []
+    for type_, categories, amount, currency, date in samples:
+        document = to_document(Transaction(
+            user_id=user_id, type=type_, categories=categories[:1], amount=amount, currency=currency, date=date
+        ))
+        # Stored as listed, e.g. by an import or a client that repeats a category
+        document["categories"] = categories
+        documents.append(document)
+    return documents
+
+
+def as_rows(buckets) -> list:
+    return [(bucket.key, bucket.currency, bucket.income, bucket.expense, bucket.count) for bucket in buckets]
+
+
+async def check_summary_paths() -> bool:
+    MONGODB_TEST_URL = os.getenv("MONGODB_TEST_URL", "mongodb://localhost:27017")
+    client = AsyncIOMotorClient(MONGODB_TEST_URL)
+    db.client = client
+    db.db = client[TEST_DATABASE]
+    db.analytics_db = db.db
+    ok = True
+    try:
+        user_id = uuid4()
+        documents = sample_documents(user_id)
+        await db.db.transactions.insert_many(documents)
+        await rollup_service.add(documents)
+        # The rollups cover every transaction in the database, as after a rebuild
+        await rollup_service.mark_built()
+
+        for group_by in (SummaryGroupBy.MONTH, SummaryGroupBy.CATEGORY):
+            from_rollups = as_rows(await transaction_service.get_summary(user_id, group_by, MONTH_START, MONTH_END))
+            aggregated = as_rows(await transaction_service.get_summary(user_id, group_by, ANY_START, ANY_END))
+            if from_rollups != aggregated:
+                ok = False
+                print(f"FAIL summary by {group_by.value}:\n  rollups:     {from_rollups}\n  aggregation: {aggregated}")
+            else:
+                print(f"ok   summary by {group_by.value}: {len(aggregated)} buckets")
+    finally:
+        await client.drop_database(TEST_DATABASE)
+        client.close()
+    return ok
+
+
+def test_summary_paths(mongodb_url):
+    assert asyncio.run(check_summary_paths()), "Summaries differ between the rollups and the aggregation (see the output)"
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(check_summary_paths()) else 1)
@@ -0,0 +1,28 @@
+// Transactions table of the dashboard, loading older transactions on demand
+
+"use client"
+
+import { DataTable } from "./transactions-table"
+import { columns } from "./columns"
+import { TransactionData } from "@/app/dashboard/types/table-types"
+import { TransactionPage } from "@/services/transactionService"
+import { useTransactionPages } from "@/hooks/use-transaction-pages"
+
+interface RecentTransactionsProps {
+  userId: string
+  initialPage: TransactionPage<TransactionData> | null
+}
+
+export function RecentTransactions({ userId, initialPage }: RecentTransactionsProps) {
+  const { items, hasMore, loading, loadMore } = useTransactionPages(userId, initialPage)
+
+  return (
+    <DataTable
+      columns={columns}
+      data={items}
+      hasMore={hasMore}
+      loadingMore={loading}
+      onLoadMore={loadMore}
+    />
+  )
+}
@@ -23,15 +23,22 @@ import {
   TableHeader,
   TableRow,
 } from "@/components/ui/table"
+import { Button } from "@/components/ui/button"
 
 interface DataTableProps<TData, TValue> {
   columns: ColumnDef<TData, TValue>[]
   data: TData[]
+  hasMore?: boolean
+  loadingMore?: boolean
+  onLoadMore?: () => void
 }
 
 export function DataTable<TData, TValue>({
   columns,
   data,
+  hasMore = false,
+  loadingMore = false,
+  onLoadMore,
 }: DataTableProps<TData, TValue>) {
   const table = useReactTable({
     data,
@@ -83,6 +90,13 @@ export function DataTable<TData, TValue>({
           )}
         </TableBody>
       </Table>
+      {onLoadMore && hasMore && (
+        <div className="flex justify-center pt-4">
+          <Button variant="outline" size="sm" onClick={onLoadMore} disabled={loadingMore}>
+            {loadingMore ? "Loading..." : "Load more"}
+          </Button>
+        </div>
+      )}
     </div>
   )
 }
@@ -36,11 +36,17 @@ import React from "react"
 interface DataTableProps<TData, TValue> {
   columns: ColumnDef<TData, TValue>[]
   data: TData[]
+  hasMore?: boolean
+  loadingMore?: boolean
+  onLoadMore?: () => void
 }
 
 export function DataTable<TData, TValue>({
   columns,
   data,
+  hasMore = false,
+  loadingMore = false,
+  onLoadMore,
 }: DataTableProps<TData, TValue>) {
   const [sorting, setSorting] = React.useState<SortingState>([])
   const [columnFilters, setColumnFilters] = React.useState<ColumnFiltersState>([])
@@ -173,6 +179,16 @@ export function DataTable<TData, TValue>({
         >
           Next
         </Button>
+        {onLoadMore && hasMore && (
+          <Button
+            variant="outline"
+            size="sm"
+            onClick={onLoadMore}
+            disabled={loadingMore}
+          >
+            {loadingMore ? "Loading..." : "Load more"}
+          </Button>
+        )}
       </div>
     </div>
   )
@@ -0,0 +1,25 @@
+"use client"
+
+import { DataTable } from "./data-table"
+import { columns, Transaction } from "./columns"
+import { TransactionPage } from "@/services/transactionService"
+import { useTransactionPages } from "@/hooks/use-transaction-pages"
+
+interface TransactionsReportProps {
+  userId: string
+  initialPage: TransactionPage<Transaction> | null
+}
+
+export function TransactionsReport({ userId, initialPage }: TransactionsReportProps) {
+  const { items, hasMore, loading, loadMore } = useTransactionPages(userId, initialPage)
+
+  return (
+    <DataTable
+      columns={columns}
+      data={items}
+      hasMore={hasMore}
+      loadingMore={loading}
+      onLoadMore={loadMore}
+    />
+  )
+}
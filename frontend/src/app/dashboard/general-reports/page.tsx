@@ -1,6 +1,5 @@
 import React from 'react'
-import { DataTable } from './components/data-table'
-import { columns } from './components/columns'
+import { TransactionsReport } from './components/transactions-report'
 import { auth } from '@/auth';
 import { transactionService } from '@/services/transactionService';
 
@@ -9,13 +8,13 @@ import { transactionService } from '@/services/transactionService';
 export default async function GeneralReportsPage() {
     // Example data - replace this with your actual data fetching logic
     const session      = await auth();
-    const transactions = await transactionService.getTransactions(session?.user?.id!);
-  console.log(transactions);
+    // Only the first page; older transactions load on demand
+    const firstPage    = await transactionService.getTransactions(session?.user?.id!);
 
     return (
         <div className="p-6">
             <h1 className="text-2xl font-bold mb-6">General Reports</h1>
-            <DataTable columns={columns} data={transactions} />
+            <TransactionsReport userId={session?.user?.id!} initialPage={firstPage} />
         </div>
     )
 }
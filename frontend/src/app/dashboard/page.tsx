@@ -2,8 +2,7 @@ import { Button } from "@/components/ui/button"
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card"
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from "@/components/ui/table"
 import AddTransDialog from "@/components/AddTransDialog"
-import { DataTable } from "./components/tables/transactions-table/transactions-table"
-import { columns } from "./components/tables/transactions-table/columns"
+import { RecentTransactions } from "./components/tables/transactions-table/recent-transactions"
 import { TransactionData } from "./types/table-types"
 import { transactionService } from "@/services/transactionService"
 import { auth } from "../../../auth"
@@ -16,7 +15,8 @@ import { authService } from "@/services/authService"
 export default async function DashboardPage() {
 
   const session      = await auth();
-  const transactions = await transactionService.getTransactions(session?.user?.id!);
+  // Only the first page; older transactions load on demand
+  const firstPage    = await transactionService.getTransactions(session?.user?.id!);
   
 
   return (
@@ -74,7 +74,7 @@ export default async function DashboardPage() {
             <CardTitle>Recent Transactions</CardTitle>
           </CardHeader>
           <CardContent>
-          <DataTable columns={columns} data={transactions} />
+          <RecentTransactions userId={session?.user?.id!} initialPage={firstPage} />
           </CardContent>
         </Card>
         
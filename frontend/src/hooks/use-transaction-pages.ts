@@ -0,0 +1,28 @@
+import * as React from "react"
+import { transactionService, TransactionPage } from "@/services/transactionService"
+
+// Transactions loaded one page at a time: starts from the server-rendered
+// first page and fetches the next one only when loadMore() is called
+export function useTransactionPages<T>(userId: string, initialPage: TransactionPage<T> | null) {
+  const [items, setItems] = React.useState<T[]>(initialPage?.items ?? [])
+  const [cursor, setCursor] = React.useState<string | null>(initialPage?.next_cursor ?? null)
+  const [loading, setLoading] = React.useState(false)
+
+  const loadMore = React.useCallback(async () => {
+    if (!cursor || loading) return
+    setLoading(true)
+    try {
+      const page = await transactionService.getTransactions(userId, cursor)
+      if (page) {
+        setItems((previous) => [...previous, ...page.items])
+        setCursor(page.next_cursor)
+      }
+    } catch (error) {
+      console.error("Error loading more transactions:", error)
+    } finally {
+      setLoading(false)
+    }
+  }, [userId, cursor, loading])
+
+  return { items, hasMore: cursor !== null, loading, loadMore }
+}
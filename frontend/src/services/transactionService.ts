@@ -2,8 +2,13 @@ import { authService } from './authService';
 import { getApiUrl } from '@/config/api';
 import { signOut } from 'next-auth/react';
 
+export interface TransactionPage<T = any> {
+    items: T[];
+    next_cursor: string | null;
+}
+
 export const transactionService = {
-    async getTransactions(userId: string) {
+    async getTransactions(userId: string, cursor: string | null = null): Promise<TransactionPage | null> {
         try {
             let accessToken = await authService.getAccessToken();
             
@@ -21,7 +26,9 @@ export const transactionService = {
                 accessToken = tokens.access_token;
             }
 
-            const response = await fetch(getApiUrl(`/api/transactions/user/${userId}`), {
+            // One page per call; pass the previous page's next_cursor to get the next one
+            const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+            const response = await fetch(getApiUrl(`/api/transactions/user/${userId}${query}`), {
                 headers: {
                     'Authorization': `Bearer ${accessToken}`,
                     'Content-Type': 'application/json',